@@ -0,0 +1,74 @@
+"""Benchmark the layered layout on branching flow charts of growing size.
+
+Run from the repository root:
+
+    python benchmarks/bench_layout.py
+
+The generated charts look like real processes: a main sequence of steps with
+decisions every few steps that branch into two or three short paths and join
+again, plus occasional loops back to an earlier step ("rework"). Layout time
+should stay well under a second at several hundred nodes.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart.layout import layered_layout  # noqa: E402
+
+
+def make_chart(count, seed=0):
+    """Return (nodes, edges) for a process of about ``count`` nodes."""
+    rng = random.Random(seed)
+    nodes, edges = ["n0"], []
+    tail = "n0"
+    while len(nodes) < count:
+        if rng.random() < 0.25:
+            decision = tail
+            join = f"n{len(nodes)}"
+            branches = []
+            for _ in range(rng.choice((2, 2, 3))):
+                previous = decision
+                for _ in range(rng.randint(1, 4)):
+                    node = f"n{len(nodes) + 1 + len(branches)}"
+                    branches.append(node)
+                    edges.append((previous, node))
+                    previous = node
+                edges.append((previous, join))
+            nodes.append(join)
+            nodes.extend(branches)
+            tail = join
+        else:
+            node = f"n{len(nodes)}"
+            nodes.append(node)
+            edges.append((tail, node))
+            tail = node
+        if rng.random() < 0.08 and len(nodes) > 6:
+            edges.append((tail, nodes[rng.randint(max(0, len(nodes) - 12), len(nodes) - 2)]))
+    return nodes, edges
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,100,300,500,1000,3000", help="Comma-separated node counts to lay out")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    print(f"{'nodes':>8} {'edges':>8} {'layers':>7} {'width':>6} {'dummies':>8} {'crossings':>10} {'ms':>9}")
+    for count in (int(size) for size in args.sizes.split(",")):
+        nodes, edges = make_chart(count)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            layout = layered_layout(nodes, edges)
+            best = min(best, time.perf_counter() - start)
+        dummies = sum(len(layer) for layer in layout.layers) - len(nodes)
+        print(f"{len(nodes):>8} {len(edges):>8} {len(layout.layers):>7} {layout.width:>6} {dummies:>8} "
+              f"{layout.crossings:>10} {best * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
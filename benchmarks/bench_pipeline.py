@@ -0,0 +1,94 @@
+"""End-to-end latency and throughput of generate -> parse -> RenderHTML.generate_html against the mock LLM server.
+
+    python benchmarks/bench_pipeline.py --concurrency 1,4,16,64 --requests 200 --latency-ms 300
+
+Starts benchmarks/mock_llm_server.py in-process (or uses --base-url) and reports
+p50/p95/p99 latency and requests per second for each concurrency level. With
+--stream the streaming path is measured and time to first step is reported too.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import add_settings_arguments, settings_from_args, start_server  # noqa: E402
+
+from flowchart.generation import generate_flow_chart_steps, stream_flow_chart_steps  # noqa: E402
+from flowchart.providers import Provider  # noqa: E402
+from flowchart.render import RenderHTML, build_arrow_chart  # noqa: E402
+
+ARROW_CHART = build_arrow_chart("Wholesale trading", "Bank transfer, card", "Maharashtra", "Rent, wages, freight")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_one(provider, index, stream):
+    """Generate and render one report; returns (latency, time to first step, succeeded)."""
+    errors = []
+    # A unique explanation per request, so nothing is served from a cache
+    explanation = f"Procurement process for benchmark company {index}: requisition, quotation, purchase order, receipt, payment."
+    start = time.perf_counter()
+    first_step = None
+    if stream:
+        steps = []
+        for step in stream_flow_chart_steps(explanation, provider, on_error=errors.append):
+            if first_step is None:
+                first_step = time.perf_counter() - start
+            steps.append(step)
+    else:
+        steps = generate_flow_chart_steps(explanation, provider, on_error=errors.append)
+        first_step = time.perf_counter() - start if steps else None
+    RenderHTML(f"Company {index}", "Benchmark company.", steps, ARROW_CHART, "Wholesale trading").generate_html()
+    return time.perf_counter() - start, first_step, bool(steps) and not errors
+
+
+def run_level(provider, concurrency, requests, stream):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda i: run_one(provider, i, stream), range(requests)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _, ok in results if ok)
+    first_steps = sorted(first for _, first, ok in results if ok and first is not None)
+    errors = sum(1 for _, _, ok in results if not ok)
+    return latencies, first_steps, errors, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--stream", action="store_true", help="Measure the streaming path")
+    parser.add_argument("--provider", choices=["groq", "openai"], default="groq", help="SDK used to talk to the server")
+    parser.add_argument("--base-url", default=None, help="Use an already running server instead of starting one")
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(settings_from_args(args))
+        host, port = server.server_address[:2]
+        base_url = f"http://{host}:{port}" + ("/v1" if args.provider == "openai" else "")
+    provider = Provider(args.provider, "mock-model", api_key="mock", base_url=base_url)
+
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'first p50':>10} {'errors':>7}")
+    for concurrency in (int(level) for level in args.concurrency.split(",")):
+        latencies, first_steps, errors, elapsed = run_level(provider, concurrency, args.requests, args.stream)
+        print(f"{concurrency:>5} {args.requests / elapsed:>8.1f} "
+              f"{percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>9.1f} {percentile(first_steps, 0.50) * 1000:>10.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark RenderHTML output size and time for growing numbers of steps.
+
+Run from the repository root:
+
+    python benchmarks/bench_render.py
+
+Time per step should stay roughly flat from 10 to 10,000 steps, showing that
+rendering scales linearly. The "cold" columns render with an empty fragment
+cache; "1 edit" re-renders after changing a single step, which only renders
+that step again.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart.render import RenderHTML, build_arrow_chart, clear_fragment_cache  # noqa: E402
+
+
+def make_steps(count):
+    return [
+        {"title": f"Step {i + 1}: Review purchase requisition",
+         "description": "Verify budget approval, confirm vendor details, check quantities, record the request in the ledger."}
+        for i in range(count)
+    ]
+
+
+def make_renderer(count):
+    return RenderHTML(
+        name="Example Trading Co.",
+        description="Example company used for benchmarking.",
+        flow_chart_steps=make_steps(count),
+        arrow_chart=build_arrow_chart("Wholesale trading", "Bank transfer, card", "Maharashtra", "Rent, wages, freight"),
+        business_activity="Wholesale trading",
+    )
+
+
+def best_of(repeat, func, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated step counts to render")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per size; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    print(f"{'steps':>8} {'bytes':>12} {'cold html ms':>13} {'cold write ms':>14} {'us/step':>8} {'1 edit ms':>10}")
+    for count in (int(size) for size in args.sizes.split(",")):
+        renderer = make_renderer(count)
+        html_time = best_of(args.repeat, renderer.generate_html, setup=clear_fragment_cache)
+        write_time = best_of(args.repeat, lambda: renderer.write_html(io.StringIO()), setup=clear_fragment_cache)
+        size = len(renderer.generate_html().encode("utf-8"))
+
+        edits = iter(range(args.repeat))
+
+        def edit_one_step():
+            renderer.flow_chart_steps[count // 2] = {"title": f"Edited step {next(edits)}", "description": "Changed text."}
+
+        edit_time = best_of(args.repeat, renderer.generate_html, setup=edit_one_step)
+        print(f"{count:>8} {size:>12} {html_time * 1000:>13.2f} {write_time * 1000:>14.2f} {html_time / count * 1e6:>8.2f} {edit_time * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
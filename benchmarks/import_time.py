@@ -0,0 +1,71 @@
+"""Measure the cold import cost of the flowchart package and catch regressions.
+
+Each module is imported in a fresh interpreter with ``-X importtime``; the
+script reports the cumulative import time and fails if it exceeds the budget
+or if a module pulls in a heavy dependency it should not load.
+
+    python benchmarks/import_time.py --budget-ms 100
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay cheap to import, and the dependencies each must not load
+CHECKS = {
+    "flowchart": ["pydantic", "groq", "openai", "streamlit", "xhtml2pdf"],
+    "flowchart.render": ["pydantic", "groq", "openai", "streamlit", "xhtml2pdf"],
+    "flowchart.pdf": ["groq", "openai", "streamlit", "xhtml2pdf"],
+    "flowchart.cache": ["pydantic", "groq", "openai", "streamlit"],
+    "flowchart.store": ["pydantic", "groq", "openai", "streamlit", "xhtml2pdf"],
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def measure(module, repeat):
+    """Return the best cumulative import time of ``module`` in microseconds and every module it loaded."""
+    best, loaded = None, set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        cumulative = None
+        for line in result.stderr.splitlines():
+            match = _IMPORT_LINE.match(line)
+            if match:
+                loaded.add(match.group(3))
+                if match.group(3) == module:
+                    cumulative = int(match.group(2))
+        if cumulative is not None and (best is None or cumulative < best):
+            best = cumulative
+    return best or 0, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Maximum allowed cumulative import time per module")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; the fastest run is reported")
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'module':<20} {'import ms':>10}  status")
+    for module, forbidden in CHECKS.items():
+        microseconds, loaded = measure(module, args.repeat)
+        leaked = sorted(dep for dep in forbidden if dep in loaded)
+        problems = []
+        if microseconds / 1000 > args.budget_ms:
+            problems.append(f"over {args.budget_ms:g} ms budget")
+        if leaked:
+            problems.append("loads " + ", ".join(leaked))
+        failed = failed or bool(problems)
+        print(f"{module:<20} {microseconds / 1000:>10.2f}  {'; '.join(problems) or 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Local stand-in for the Groq/OpenAI chat-completions API, for benchmarks and offline development.
+
+Answers POST requests to any path ending in ``/chat/completions`` (so both
+``/openai/v1/chat/completions`` for Groq and ``/v1/chat/completions`` for
+OpenAI work) with canned flow chart JSON, after a configurable delay.
+
+    python benchmarks/mock_llm_server.py --port 8765 --latency-ms 800 --error-rate 0.02
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock streamlit run flowchart_main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockSettings:
+    """Behaviour of the mock server; shared by every request handler."""
+
+    def __init__(self, latency_ms=500.0, jitter_ms=100.0, first_token_ms=150.0, chunk_chars=24, steps=8,
+                 shape="steps", error_rate=0.0, error_statuses=(429, 500, 503), retry_after=1.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.first_token_ms = first_token_ms
+        self.chunk_chars = chunk_chars
+        self.steps = steps
+        self.shape = shape
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self, base_ms):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base_ms + jitter) / 1000.0
+
+    def pick_error(self):
+        with self.lock:
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.random.choice(self.error_statuses)
+        return None
+
+
+def canned_steps(count):
+    return [
+        {
+            "title": f"Step {i + 1}: Procurement stage {i + 1}",
+            "description": (f"Identify the requirement for stage {i + 1}, obtain quotations from approved vendors, "
+                            "compare prices and terms, raise and approve the purchase order, record the invoice in the books."),
+        }
+        for i in range(count)
+    ]
+
+
+def canned_content(settings):
+    """Build the JSON answer in the shape the model is configured to return."""
+    steps = canned_steps(settings.steps)
+    if settings.shape == "single":
+        return json.dumps(steps[0])
+    if settings.shape == "list":
+        return json.dumps(steps)
+    return json.dumps({"steps": steps})
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            return
+
+        status = self.settings.pick_error()
+        if status is not None:
+            time.sleep(self.settings.delay(self.settings.first_token_ms))
+            headers = {"Retry-After": f"{self.settings.retry_after:g}"} if status == 429 else {}
+            self._send_json(status, {"error": {"message": f"Mock upstream error {status}", "type": "mock_error"}}, headers)
+            return
+
+        content = canned_content(self.settings)
+        model = body.get("model", "mock-model")
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(content),
+                 "total_tokens": prompt_tokens + estimate_tokens(content)}
+        if body.get("stream"):
+            self._stream(content, model, usage)
+        else:
+            time.sleep(self.settings.delay(self.settings.latency_ms))
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(self, content, model, usage):
+        """Send the answer as server-sent events, spread evenly over the configured latency."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        size = max(1, self.settings.chunk_chars)
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        time.sleep(self.settings.delay(self.settings.first_token_ms))
+        per_piece = max(0.0, self.settings.latency_ms - self.settings.first_token_ms) / 1000.0 / max(1, len(pieces))
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": "stop" if last else None}],
+            }
+            if last:
+                chunk["usage"] = usage
+            self._write_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            if per_piece and not last:
+                time.sleep(per_piece)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def start_server(settings, host="127.0.0.1", port=0):
+    """Start the mock server on a background thread and return it; ``server.server_address`` has the bound port."""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server
+
+
+def add_settings_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Mean time to a full (non-streamed) answer")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="Uniform +/- jitter added to every delay")
+    parser.add_argument("--first-token-ms", type=float, default=150.0, help="Delay before the first streamed chunk")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="Characters per streamed chunk")
+    parser.add_argument("--steps", type=int, default=8, help="Number of flow chart steps in the canned answer")
+    parser.add_argument("--shape", choices=["steps", "single", "list"], default="steps",
+                        help="Answer shape: {\"steps\": [...]} as the prompt asks for, one step object, or a bare list")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-statuses", default="429,500,503", help="HTTP statuses used for failures")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible jitter and errors")
+
+
+def settings_from_args(args):
+    return MockSettings(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, first_token_ms=args.first_token_ms,
+        chunk_chars=args.chunk_chars, steps=args.steps, shape=args.shape, error_rate=args.error_rate,
+        error_statuses=[int(status) for status in args.error_statuses.split(",") if status.strip()],
+        retry_after=args.retry_after, seed=args.seed,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = start_server(settings_from_args(args), args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Mock chat-completions server on http://{host}:{port} (Groq base URL) and http://{host}:{port}/v1 (OpenAI base URL)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
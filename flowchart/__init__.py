@@ -0,0 +1,67 @@
+"""Business flow chart generation and rendering, independent of the Streamlit UI.
+
+Importing the package is cheap: nothing is imported until one of the names
+below is first accessed, so a worker that only renders never loads pydantic,
+the LLM clients or Streamlit.
+"""
+import importlib
+
+_EXPORTS = {
+    "FlowChartStep": "flowchart.models",
+    "FlowChartSteps": "flowchart.models",
+    "FlowChartNode": "flowchart.models",
+    "FlowChartEdge": "flowchart.models",
+    "FlowChartGraph": "flowchart.models",
+    "MODEL_NAME": "flowchart.models",
+    "SYSTEM_PROMPT": "flowchart.models",
+    "PROMPT_VERSION": "flowchart.models",
+    "get_system_prompt": "flowchart.models",
+    "build_messages": "flowchart.generation",
+    "parse_steps_response": "flowchart.generation",
+    "generate_flow_chart_steps": "flowchart.generation",
+    "agenerate_flow_chart_steps": "flowchart.generation",
+    "stream_flow_chart_steps": "flowchart.generation",
+    "find_similar_steps": "flowchart.generation",
+    "generate_process_steps": "flowchart.generation",
+    "agenerate_process_steps": "flowchart.generation",
+    "generate_professional_content": "flowchart.render",
+    "build_arrow_chart": "flowchart.render",
+    "ArrowSection": "flowchart.sections",
+    "ARROW_SECTIONS": "flowchart.sections",
+    "RenderHTML": "flowchart.render",
+    "ResponseCache": "flowchart.cache",
+    "ReportStore": "flowchart.store",
+    "SingleFlight": "flowchart.singleflight",
+    "inflight": "flowchart.singleflight",
+    "StepStreamParser": "flowchart.streaming",
+    "StepTable": "flowchart.steps",
+    "parse_steps": "flowchart.parsing",
+    "repair_json": "flowchart.parsing",
+    "render_pdf": "flowchart.pdf",
+    "Provider": "flowchart.providers",
+    "load_providers": "flowchart.providers",
+    "RateLimiter": "flowchart.ratelimit",
+    "priority": "flowchart.ratelimit",
+    "render_pdfs": "flowchart.pdf",
+    "write_export": "flowchart.export",
+    "layered_layout": "flowchart.layout",
+    "UsageMeter": "flowchart.usage",
+    "usage_meter": "flowchart.usage",
+    "Tracer": "flowchart.tracing",
+    "span": "flowchart.tracing",
+    "tracing": "flowchart.tracing",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'flowchart' has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+from flowchart.cache import ResponseCache
+from flowchart.export import FORMATS as EXPORT_FORMATS
+from flowchart.generation import DEFAULT_HEDGE, agenerate_process_steps
+from flowchart.pdf import get_pdf_pool, html_to_pdf_bytes
+from flowchart.providers import BACKENDS, DEFAULT_PROVIDERS, load_providers
+from flowchart.ratelimit import BATCH, priority
+from flowchart.render import DEFAULT_PROCESS_TITLE, RenderHTML, build_arrow_chart
+from flowchart.store import DEFAULT_STORE_PATH, ReportStore, make_input_hash
+from flowchart.tracing import MAX_SPANS, Tracer, span, tracing
+from flowchart.usage import usage_meter
+
+logger = logging.getLogger("flowchart.batch")
+
+# Columns accepted in the input file, in the order they appear in the Streamlit form
+PROFILE_FIELDS = ["name", "description", "business_activity", "billing", "place_of_supply", "expenses", "explanation"]
+
+# Optional column listing further processes as JSON: [{"title": "Sales Process", "explanation": "..."}, ...]
+PROCESSES_FIELD = "processes"
+
+
+def _text(value) -> str:
+    # JSONL values can be numbers, null or nested objects rather than strings
+    return "" if value is None else str(value).strip()
+
+
+def _read_rows(f, jsonl: bool):
+    """Yield (line number, row dict) pairs; a row that cannot be read is yielded as its ValueError."""
+    if not jsonl:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"invalid JSON: {e}")
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError(f"expected a JSON object, got {type(row).__name__}")
+
+
+def read_profiles(path: str, skipped: Optional[List[int]] = None) -> List[dict]:
+    """Read company profiles from a CSV file (with a header row) or a JSONL file.
+
+    A malformed row is logged with its line number and left out, so one bad row
+    does not stop the rest of the batch; the line numbers are added to ``skipped``.
+    """
+    profiles = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_number, row in _read_rows(f, path.lower().endswith((".jsonl", ".ndjson"))):
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                profile = {field: _text(row.get(field)) for field in PROFILE_FIELDS}
+                profile["processes"] = read_processes(profile["explanation"], row.get(PROCESSES_FIELD))
+            except ValueError as e:
+                logger.error("%s line %d skipped: %s", path, line_number, e)
+                if skipped is not None:
+                    skipped.append(line_number)
+                continue
+            profiles.append(profile)
+    return profiles
+
+
+def read_processes(explanation: str, extra) -> List[dict]:
+    """The processes of one report: the explanation as the procurement process, then any extra ones.
+
+    Raises ValueError when ``extra`` is not a JSON list of objects.
+    """
+    if isinstance(extra, str):
+        try:
+            extra = json.loads(extra) if extra.strip() else []
+        except ValueError as e:
+            raise ValueError(f"invalid JSON in the {PROCESSES_FIELD} column: {e}") from e
+    if extra is not None and not isinstance(extra, list):
+        raise ValueError(f"{PROCESSES_FIELD} must be a list of objects, got {type(extra).__name__}")
+    processes = [{"title": DEFAULT_PROCESS_TITLE, "explanation": explanation}]
+    for process in extra or []:
+        if not isinstance(process, dict):
+            raise ValueError(f"{PROCESSES_FIELD} entries must be objects, got {type(process).__name__}")
+        title, process_explanation = _text(process.get("title")), _text(process.get("explanation"))
+        if title and process_explanation:
+            processes.append({"title": title, "explanation": process_explanation})
+    return processes
+
+
+def output_filename(index: int, name: str, extension: str = "html") -> str:
+    """Build a filesystem-safe, unique file name for a company's report."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower() or "company"
+    return f"{index:05d}_{slug}.{extension}"
+
+
+def profile_arrow_chart(profile: dict) -> dict:
+    return build_arrow_chart(profile["business_activity"], profile["billing"], profile["place_of_supply"], profile["expenses"])
+
+
+def report_generator(profile: dict, processes: List[dict], compact: bool = False, minify: bool = False) -> RenderHTML:
+    return RenderHTML(
+        name=profile["name"],
+        description=profile["description"],
+        flow_chart_steps=processes[0]["steps"] if processes else [],
+        arrow_chart=profile_arrow_chart(profile),
+        business_activity=profile["business_activity"],
+        compact=compact,
+        minify=minify,
+        processes=processes if len(processes) > 1 else None,
+    )
+
+
+def render_report(profile: dict, processes: List[dict], for_pdf: bool = False, compact: bool = False, minify: bool = False) -> str:
+    """Render a report from generated ``{"title", "steps"}`` processes; the first is the procurement process."""
+    return report_generator(profile, processes, compact, minify).generate_html(for_pdf=for_pdf)
+
+
+def write_exports(profile: dict, processes: List[dict], index: int, output_dir: str, exports: Sequence[str]) -> None:
+    """Write the report's flow charts in each export format, streamed straight to disk."""
+    html_generator = report_generator(profile, processes)
+    for fmt in exports:
+        extension, _ = EXPORT_FORMATS[fmt]
+        with open(os.path.join(output_dir, output_filename(index, profile["name"], extension)), "w", encoding="utf-8") as f:
+            html_generator.write_export(f, fmt)
+
+
+async def generate_report(index: int, profile: dict, provider, cache, semaphore: asyncio.Semaphore, output_dir: str,
+                          pdf: bool = False, compact: bool = False, minify: bool = False, exports: Sequence[str] = (),
+                          store: Optional[ReportStore] = None, reuse: bool = True) -> Tuple[bool, bool]:
+    """Generate, render and write one company's report.
+
+    Returns whether every process got steps, and whether the PDF failed. A failed
+    PDF still leaves the HTML written and the steps saved to the store.
+
+    With a ``store``, the report is saved to it, and with ``reuse`` a stored report for
+    identical inputs is rendered again instead of calling the LLM.
+    """
+    with span("report", index=index, company=profile["name"]) as report_span:
+        stored = None
+        if store is not None and reuse:
+            input_hash = make_input_hash(profile["name"], profile["description"], profile["business_activity"],
+                                         profile_arrow_chart(profile), profile["processes"])
+            stored = await asyncio.to_thread(store.find, input_hash)
+        if stored is not None and all(process["steps"] for process in stored.processes):
+            report_span.set(reused=stored.report_id)
+            processes = stored.processes
+        else:
+            stored = None
+            errors = []
+            # Each process takes its own slot, so the processes of one report run side by side
+            processes = await agenerate_process_steps(profile["processes"], provider, cache, on_error=errors.append, limit=semaphore)
+            for error in errors:
+                logger.error("%s: %s", profile["name"], error)
+
+        html_output = render_report(profile, processes, compact=compact, minify=minify)
+        path = os.path.join(output_dir, output_filename(index, profile["name"]))
+        await asyncio.to_thread(_write_text, path, html_output)
+        if exports:
+            await asyncio.to_thread(write_exports, profile, processes, index, output_dir, exports)
+
+        artifacts = {"html": html_output}
+        pdf_failed = False
+        if pdf:
+            # Conversion is CPU bound, so it runs in the process pool rather than on the event loop
+            loop = asyncio.get_running_loop()
+            html_for_pdf = render_report(profile, processes, for_pdf=True, compact=compact, minify=minify)
+            with span("pdf.convert", html_bytes=len(html_for_pdf.encode("utf-8"))) as conversion:
+                try:
+                    pdf_bytes = await loop.run_in_executor(get_pdf_pool(), html_to_pdf_bytes, html_for_pdf)
+                except Exception as e:
+                    conversion.set(error=str(e))
+                    logger.error("%s: Error generating PDF: %s", profile["name"], e)
+                    pdf_failed = True
+                else:
+                    conversion.set(pdf_bytes=len(pdf_bytes))
+            if not pdf_failed:
+                pdf_path = os.path.join(output_dir, output_filename(index, profile["name"], "pdf"))
+                await asyncio.to_thread(_write_bytes, pdf_path, pdf_bytes)
+                artifacts["pdf"] = pdf_bytes
+
+        complete = all(process["steps"] for process in processes)
+        if store is not None and complete:
+            if stored is not None:
+                await asyncio.to_thread(store.save_artifacts, stored.report_id, artifacts)
+            else:
+                # Keep each process's explanation with its steps, so the stored report can be matched and shown later
+                processes = [dict(process, steps=result["steps"]) for process, result in zip(profile["processes"], processes)]
+                await asyncio.to_thread(store.save, profile["name"], profile["description"], profile["business_activity"],
+                                        profile_arrow_chart(profile), processes, artifacts)
+        return complete, pdf_failed
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def run_batch(profiles: List[dict], output_dir: str, concurrency: int, use_cache: bool = True, pdf: bool = False,
+                    compact: bool = False, minify: bool = False, providers: str = DEFAULT_PROVIDERS,
+                    tracer: Optional[Tracer] = None, exports: Sequence[str] = (), store_path: Optional[str] = None) -> int:
+    """Generate every report with at most ``concurrency`` LLM calls in flight.
+
+    Returns the number of failures: reports with a process that got no steps, plus PDFs that failed.
+
+    With a ``tracer``, every report records spans for its LLM request, parsing, rendering and PDF conversion.
+    With a ``store_path``, reports are saved to that report store, and unless ``use_cache`` is off,
+    reports whose inputs are already stored are rendered from it without calling the LLM.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    provider = load_providers(providers)
+    cache = ResponseCache() if use_cache else None
+    store = ReportStore(store_path) if store_path else None
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # Tasks copy the current context when created, so each one reports to the tracer and
+    # queues its LLM calls behind interactive ones when a rate limit is reached
+    with tracing(tracer), priority(BATCH):
+        tasks = [
+            asyncio.create_task(generate_report(index, profile, provider, cache, semaphore, output_dir, pdf, compact, minify, exports,
+                                                store, reuse=use_cache))
+            for index, profile in enumerate(profiles, start=1)
+        ]
+    failures = pdf_failures = 0
+    try:
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            complete, pdf_failed = await task
+            failures += not complete
+            pdf_failures += pdf_failed
+            if done % 50 == 0 or done == len(tasks):
+                logger.info("%d/%d reports written (%d without steps)", done, len(tasks), failures)
+    finally:
+        # The async clients belong to this event loop, including the hedge provider's
+        await provider.aclose()
+        if DEFAULT_HEDGE is not None:
+            await DEFAULT_HEDGE.aclose()
+    for model, totals in usage_meter.snapshot().items():
+        logger.info("%s: %d requests, %d prompt tokens, %d completion tokens", model, totals["requests"],
+                    totals["prompt_tokens"], totals["completion_tokens"])
+    if pdf_failures:
+        logger.error("%d PDF(s) could not be generated; their HTML reports and steps were still written", pdf_failures)
+    return failures + pdf_failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate business flow chart reports for many companies without the Streamlit UI.")
+    parser.add_argument("input", help="CSV (with header) or JSONL file of company profiles with columns: " + ", ".join(PROFILE_FIELDS)
+                        + f" and optionally {PROCESSES_FIELD}")
+    parser.add_argument("-o", "--output-dir", default="reports", help="Directory the HTML reports are written to")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum number of LLM calls in flight at once")
+    parser.add_argument("--pdf", action="store_true", help="Also write a server-rendered PDF next to each HTML report")
+    parser.add_argument("--compact", action="store_true", help="Use one shared stylesheet instead of inline styles")
+    parser.add_argument("--minify", action="store_true", help="Strip comments and indentation from the generated HTML")
+    parser.add_argument("--providers", default=DEFAULT_PROVIDERS, help="LLM providers to try in order, as name:model[,name:model]")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the LLM instead of reusing cached or stored steps")
+    parser.add_argument("--store", nargs="?", const=DEFAULT_STORE_PATH, metavar="PATH",
+                        help=f"Save every report to the SQLite report store at PATH (default {DEFAULT_STORE_PATH})")
+    parser.add_argument("--trace", metavar="FILE", help="Write timing spans for every report to FILE as JSON lines")
+    parser.add_argument("--export", default="", help="Also write the flow charts in these formats, comma-separated: "
+                        + ", ".join(EXPORT_FORMATS))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    provider = load_providers(args.providers)
+    for backend in getattr(provider, "providers", [provider]):
+        if not backend.api_key:
+            logger.error("%s API key not found in environment variable %s!", backend.name, BACKENDS[backend.name]["api_key_env"])
+            return 2
+
+    exports = [fmt.strip().lower() for fmt in args.export.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in exports if fmt not in EXPORT_FORMATS]
+    if unknown:
+        parser.error(f"unknown export format(s): {', '.join(unknown)}")
+
+    skipped = []
+    profiles = read_profiles(args.input, skipped)
+    # Around a dozen spans per report with --pdf; keep all of them
+    tracer = Tracer(max_spans=max(MAX_SPANS, 20 * len(profiles))) if args.trace else None
+    failures = asyncio.run(run_batch(profiles, args.output_dir, max(1, args.concurrency), use_cache=not args.no_cache, pdf=args.pdf,
+                                     compact=args.compact, minify=args.minify, providers=args.providers, tracer=tracer, exports=exports,
+                                     store_path=args.store))
+    if tracer is not None:
+        with open(args.trace, "w", encoding="utf-8") as f:
+            tracer.write_jsonl(f)
+        logger.info("Wrote %d spans to %s", len(tracer.spans), args.trace)
+    if skipped:
+        logger.error("%d input row(s) skipped as malformed (lines %s)", len(skipped), ", ".join(map(str, skipped)))
+    return 1 if failures or skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional, Tuple
+from flowchart.similarity import LSHIndex, jaccard, minhash, shingles
+
+# Defaults can be overridden per deployment through environment variables
+DEFAULT_CACHE_PATH = os.getenv("FLOWCHART_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "flowchart", "responses.sqlite3"))
+DEFAULT_MAX_BYTES = int(os.getenv("FLOWCHART_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = float(os.getenv("FLOWCHART_CACHE_TTL", str(30 * 24 * 3600)))
+# An explanation at least this similar (Jaccard index of word triples) to a cached one reuses its answer
+# without calling the LLM; set it above 1 to only reuse exact matches
+DEFAULT_REUSE_SIMILARITY = float(os.getenv("FLOWCHART_REUSE_SIMILARITY", "0.9"))
+
+
+def normalize_explanation(explanation: str) -> str:
+    """Collapse whitespace and case so trivially different inputs share a cache entry."""
+    return " ".join((explanation or "").split()).lower()
+
+
+def make_cache_key(explanation: str, model: str, prompt: str) -> str:
+    """Build the cache key from the normalized explanation, the model and a hash of the prompt/schema."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps([normalize_explanation(explanation), model, prompt_hash])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_cache_scope(model: str, prompt: str) -> str:
+    """Identify the model and prompt an answer came from; only answers from the same scope count as near duplicates."""
+    return hashlib.sha256(json.dumps([model, hashlib.sha256(prompt.encode("utf-8")).hexdigest()]).encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Disk-backed LRU cache for generated flow chart steps.
+
+    Entries live in a SQLite file so they are shared by every Streamlit session
+    and survive process restarts. Least recently used entries are evicted once
+    the stored payloads exceed ``max_bytes``; entries older than ``ttl`` seconds
+    are treated as misses.
+
+    Entries stored with their explanation are also indexed for near-duplicate
+    lookup (MinHash/LSH, see flowchart.similarity). The LSH buckets are kept in
+    memory and rebuilt from the stored signatures when the cache is opened.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL_SECONDS,
+                 reuse_similarity: float = DEFAULT_REUSE_SIMILARITY):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.reuse_similarity = reuse_similarity
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            " key TEXT PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " explanation TEXT NOT NULL,"
+            " signature BLOB NOT NULL)"
+        )
+        self._lsh = LSHIndex()
+        for key, scope, signature in self._conn.execute("SELECT key, scope, signature FROM explanations"):
+            self._lsh.add(key, array("I", signature), scope)
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        """Return the cached steps for ``key`` or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._drop_explanations([(key,)])
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, steps: List[dict], explanation: Optional[str] = None, scope: str = "") -> None:
+        """Store ``steps`` under ``key`` and evict old entries to stay under the byte cap.
+
+        With the ``explanation`` (and the ``scope`` from make_cache_scope), later
+        near-duplicate explanations can find this entry through find_similar.
+        """
+        value = json.dumps(steps)
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # A single oversized entry would just evict everything else
+        signature = minhash(shingles(explanation)) if explanation is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            if signature is not None:
+                self._conn.execute("INSERT OR REPLACE INTO explanations (key, scope, explanation, signature) VALUES (?, ?, ?, ?)",
+                                   (key, scope, explanation, signature.tobytes()))
+                self._lsh.add(key, signature, scope)
+            self._evict(now)
+
+    def find_similar(self, explanation: str, scope: str = "", min_similarity: Optional[float] = None) -> Optional[Tuple[float, List[dict]]]:
+        """The cached steps of the most similar earlier explanation and its similarity, or None below ``min_similarity``.
+
+        Defaults to ``reuse_similarity``. LSH picks the candidates, which are then
+        scored by the exact Jaccard index of their shingles.
+        """
+        min_similarity = self.reuse_similarity if min_similarity is None else min_similarity
+        if min_similarity > 1:
+            return None
+        wanted = shingles(explanation)
+        signature = minhash(wanted)
+        now = time.time()
+        with self._lock:
+            # The buckets are sets that set() and _evict mutate, so they are only read under the lock
+            candidates = self._lsh.candidates(signature, scope)
+            if not candidates:
+                return None
+            rows = self._conn.execute(
+                "SELECT e.key, e.explanation, r.value, r.created FROM explanations e JOIN responses r ON r.key = e.key"
+                f" WHERE e.key IN ({', '.join('?' * len(candidates))})", candidates).fetchall()
+        best = None
+        for key, candidate, value, created in rows:
+            if self.ttl and now - created > self.ttl:
+                continue
+            similarity = jaccard(wanted, shingles(candidate))
+            if similarity >= min_similarity and (best is None or similarity > best[0]):
+                best = (similarity, key, value)
+        if best is None:
+            return None
+        similarity, key, value = best
+        with self._lock:
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return similarity, json.loads(value)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl and self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,)).rowcount:
+            self._drop_explanations()
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk entries from least to most recently used until we are back under the cap
+        excess = total - self.max_bytes
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self._drop_explanations(stale)
+
+    def _drop_explanations(self, orphans: Optional[List[Tuple[str]]] = None) -> None:
+        """Forget the explanations of deleted responses, in the table and the LSH buckets.
+
+        ``orphans`` are the deleted keys as 1-tuples; by default every explanation
+        whose response is gone.
+        """
+        if orphans is None:
+            orphans = self._conn.execute("SELECT key FROM explanations WHERE key NOT IN (SELECT key FROM responses)").fetchall()
+        self._conn.executemany("DELETE FROM explanations WHERE key = ?", orphans)
+        for (key,) in orphans:
+            self._lsh.remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM explanations")
+            self._lsh.clear()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
@@ -0,0 +1,366 @@
+"""Mermaid, Graphviz DOT and standalone SVG versions of a flow chart.
+
+Every exporter writes through ``fp.write`` one element at a time, so a chart
+with any number of steps is never built up as one string. Sections are
+``(title, steps, graph)`` triples as returned by ``RenderHTML.sections()``,
+where ``graph`` is None for a plain list of steps or the (nodes, edges) of a
+branching chart, and arrow chart rows are ``(title, content)`` pairs as from
+``RenderHTML.arrow_chart_rows()``.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape as xml_escape
+from flowchart.layout import Dummy, layered_layout
+
+Graph = Tuple[List[dict], List[Tuple[str, str, str]]]
+Section = Tuple[str, Sequence[dict], Optional[Graph]]
+ArrowRow = Tuple[str, str]
+
+# Output formats and the file extension and MIME type of each
+FORMATS = {
+    "mermaid": ("mmd", "text/vnd.mermaid"),
+    "dot": ("dot", "text/vnd.graphviz"),
+    "svg": ("svg", "image/svg+xml"),
+}
+
+
+def step_text(step: dict) -> Tuple[str, str]:
+    """The title and description of a step as plain strings, cleaned the way the HTML output cleans them."""
+    description = step["description"]
+    if isinstance(description, str):
+        description = description.replace('*', '')
+    else:
+        description = str(description).replace('*', '').replace('[', '').replace(']', '')
+    return str(step["title"]), description
+
+
+def wrap(text: str, width: int) -> List[str]:
+    """Greedy word wrap; several times faster than textwrap, which matters at tens of thousands of steps."""
+    lines, line = [], ""
+    for word in text.split():
+        if not line:
+            line = word
+        elif len(line) + 1 + len(word) <= width:
+            line += " " + word
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines
+
+
+# Mermaid
+
+def _mermaid_label(text: str) -> str:
+    # Mermaid has no backslash escapes inside quoted labels; entity codes are its escape mechanism
+    text = text.replace('"', "#quot;").replace("<", "#lt;").replace(">", "#gt;")
+    return text.replace("\r\n", "<br/>").replace("\n", "<br/>")
+
+
+def _write_mermaid_graph(write, prefix: str, graph: Graph) -> bool:
+    """Write the nodes and edges of a branching section; True if it has decision nodes."""
+    nodes, edges = graph
+    names = {}
+    for node_index, node in enumerate(nodes, start=1):
+        name = names[node["id"]] = f"{prefix}s{node_index}"
+        step_title, description = step_text(node)
+        if node["kind"] == "decision":
+            # Only the question goes in a diamond; with the description it would grow far too wide
+            write(f'        {name}{{"{_mermaid_label(step_title)}"}}:::decision\n')
+        else:
+            write(f'        {name}["<b>{_mermaid_label(step_title)}</b><br/>{_mermaid_label(description)}"]:::step\n')
+    for source, target, label in edges:
+        arrow = f'-->|"{_mermaid_label(label)}"|' if label else "-->"
+        write(f"        {names[source]} {arrow} {names[target]}\n")
+    return any(node["kind"] == "decision" for node in nodes)
+
+
+def write_mermaid(fp, sections: Iterable[Section], arrow_rows: Iterable[ArrowRow] = ()) -> None:
+    """Write a Mermaid ``flowchart TD`` with one subgraph per process and one for the arrow chart."""
+    write = fp.write
+    write("flowchart TD\n")
+    rows = list(arrow_rows)
+    if rows:
+        write('    subgraph overview["Business overview"]\n        direction LR\n')
+        for index, (title, content) in enumerate(rows, start=1):
+            write(f'        a{index}["{_mermaid_label(title)}"]:::title --> c{index}["{_mermaid_label(content)}"]:::content\n')
+        write("    end\n")
+    decisions = False
+    for section_index, (title, steps, graph) in enumerate(sections, start=1):
+        write(f'    subgraph p{section_index}["{_mermaid_label(title)}"]\n')
+        if graph is not None:
+            decisions = _write_mermaid_graph(write, f"p{section_index}", graph) or decisions
+            write("    end\n")
+            continue
+        previous = None
+        for step_index, step in enumerate(steps, start=1):
+            node = f"p{section_index}s{step_index}"
+            step_title, description = step_text(step)
+            write(f'        {node}["<b>{_mermaid_label(step_title)}</b><br/>{_mermaid_label(description)}"]:::step\n')
+            if previous is not None:
+                write(f"        {previous} --> {node}\n")
+            previous = node
+        write("    end\n")
+    write("    classDef step fill:#f0f0f0,stroke:#333,color:#333\n")
+    if decisions:
+        write("    classDef decision fill:#fff,stroke:#0C6C98,color:#0C6C98\n")
+    write("    classDef title fill:#0C6C98,stroke:#0C6C98,color:#fff\n")
+    write("    classDef content fill:#D3D3D3,stroke:#D3D3D3,color:#000\n")
+
+
+# Graphviz DOT
+
+def _dot_string(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\r\n", "\\n").replace("\n", "\\n") + '"'
+
+
+def _dot_wrap(text: str, width: int = 60) -> str:
+    return "\\n".join(_dot_string(line)[1:-1] for line in wrap(text, width) or [""])
+
+
+def _dot_step_label(step: dict) -> str:
+    step_title, description = step_text(step)
+    # Graphviz's \l ends a left-justified line
+    return _dot_wrap(step_title) + "\\n\\n" + "\\l".join(_dot_string(line)[1:-1] for line in wrap(description, 60)) + "\\l"
+
+
+def _write_dot_graph(write, prefix: str, graph: Graph) -> None:
+    nodes, edges = graph
+    names = {}
+    for node_index, node in enumerate(nodes, start=1):
+        name = names[node["id"]] = f"{prefix}s{node_index}"
+        if node["kind"] == "decision":
+            # As in Mermaid, the diamond holds only the question
+            write(f'        {name} [label="{_dot_wrap(step_text(node)[0], 30)}", shape=diamond, style=filled, '
+                  'fillcolor="white", color="#0C6C98", fontcolor="#0C6C98"];\n')
+        else:
+            write(f'        {name} [label="{_dot_step_label(node)}"];\n')
+    for source, target, label in edges:
+        attributes = f" [label={_dot_string(label)}]" if label else ""
+        write(f"        {names[source]} -> {names[target]}{attributes};\n")
+
+
+def write_dot(fp, sections: Iterable[Section], arrow_rows: Iterable[ArrowRow] = ()) -> None:
+    """Write a Graphviz digraph with one cluster per process and one for the arrow chart."""
+    write = fp.write
+    write("digraph flowchart {\n")
+    write('    graph [fontname="Arial", rankdir=TB, nodesep=0.4, ranksep=0.35];\n')
+    write('    node [fontname="Arial", fontsize=10, shape=box, style="rounded,filled", fillcolor="#f0f0f0", color="#333333"];\n')
+    write('    edge [color="#333333", arrowsize=0.8];\n')
+    rows = list(arrow_rows)
+    if rows:
+        write('    subgraph cluster_overview {\n        label="Business overview";\n')
+        for index, (title, content) in enumerate(rows, start=1):
+            write(f'        a{index} [label={_dot_string(title)}, fillcolor="#0C6C98", fontcolor="white", color="#0C6C98"];\n')
+            write(f'        c{index} [label="{_dot_wrap(content, 40)}", shape=cds, style=filled, fillcolor="#D3D3D3", color="#D3D3D3"];\n')
+            write(f"        {{ rank=same; a{index} -> c{index}; }}\n")
+            if index > 1:
+                write(f"        a{index - 1} -> a{index} [style=invis];\n")
+        write("    }\n")
+    for section_index, (title, steps, graph) in enumerate(sections, start=1):
+        write(f"    subgraph cluster_p{section_index} {{\n        label={_dot_string(title)};\n")
+        if graph is not None:
+            _write_dot_graph(write, f"p{section_index}", graph)
+            write("    }\n")
+            continue
+        previous = None
+        for step_index, step in enumerate(steps, start=1):
+            node = f"p{section_index}s{step_index}"
+            write(f'        {node} [label="{_dot_step_label(step)}"];\n')
+            if previous is not None:
+                write(f"        {previous} -> {node};\n")
+            previous = node
+        write("    }\n")
+    write("}\n")
+
+
+# Standalone SVG
+
+SVG_WIDTH = 640
+SVG_MARGIN = 20
+SVG_LINE_HEIGHT = 16
+SVG_STEP_GAP = 36  # Room for the connector arrow between steps
+SVG_WRAP = 80  # Characters per description line at 12px in a 600px box
+SVG_ARROW_ROW_HEIGHT = 80
+SVG_GRAPH_COLUMN = 240  # Width of one layout column in a branching chart, including the gap
+SVG_GRAPH_WRAP = 30  # Characters per description line in a node box
+
+
+def _step_lines(step: dict) -> Tuple[List[str], List[str]]:
+    title, description = step_text(step)
+    return wrap(title, SVG_WRAP - 20) or [""], wrap(description, SVG_WRAP) or [""]
+
+
+def _step_height(title_lines: List[str], description_lines: List[str]) -> int:
+    return (len(title_lines) + len(description_lines)) * SVG_LINE_HEIGHT + 28
+
+
+class _GraphPlan:
+    """The layered layout of one branching section, with every node's wrapped text and the height of each layer."""
+
+    def __init__(self, graph: Graph):
+        nodes, self.edges = graph
+        self.nodes = {node["id"]: node for node in nodes}
+        self.layout = layered_layout(list(self.nodes), [(source, target) for source, target, _ in self.edges])
+        self.lines = {}
+        for node_id, node in self.nodes.items():
+            title, description = step_text(node)
+            if node["kind"] == "decision":
+                title = "\u25c6 " + title
+            self.lines[node_id] = (wrap(title, SVG_GRAPH_WRAP - 6) or [""], wrap(description, SVG_GRAPH_WRAP) or [""])
+        self.row_heights = [
+            max((_step_height(*self.lines[node_id]) for node_id in layer if not isinstance(node_id, Dummy)), default=2 * SVG_LINE_HEIGHT)
+            for layer in self.layout.layers]
+        self.width = 2 * SVG_MARGIN + self.layout.width * SVG_GRAPH_COLUMN
+
+    @property
+    def height(self) -> int:
+        return sum(self.row_heights) + SVG_STEP_GAP * max(0, len(self.row_heights) - 1)
+
+
+def _svg_height(sections: Sequence[Section], plans: Sequence[Optional[_GraphPlan]], rows: Sequence[ArrowRow]) -> int:
+    height = SVG_MARGIN + len(rows) * (SVG_ARROW_ROW_HEIGHT + 20)
+    for (_, steps, _), plan in zip(sections, plans):
+        height += 40
+        if plan is not None:
+            height += plan.height
+        else:
+            for step_index, step in enumerate(steps):
+                height += _step_height(*_step_lines(step)) + (SVG_STEP_GAP if step_index else 0)
+        height += 20
+    return height + SVG_MARGIN
+
+
+def _write_svg_text(write, x: int, y: int, title_lines: List[str], description_lines: List[str], center: int,
+                    title_fill: str = "#333") -> None:
+    write(f'<text x="{center}" y="{y}" text-anchor="middle" font-size="13" font-weight="bold" fill="{title_fill}">')
+    for line_index, line in enumerate(title_lines):
+        write(f'<tspan x="{center}" dy="{0 if line_index == 0 else SVG_LINE_HEIGHT}">{xml_escape(line)}</tspan>')
+    write("</text>")
+    y += len(title_lines) * SVG_LINE_HEIGHT + 4
+    write(f'<text x="{x}" y="{y}" font-size="12" fill="#555">')
+    for line_index, line in enumerate(description_lines):
+        write(f'<tspan x="{x}" dy="{0 if line_index == 0 else SVG_LINE_HEIGHT}">{xml_escape(line)}</tspan>')
+    write("</text>")
+
+
+def _write_svg_graph(write, plan: _GraphPlan, y: int, center: int) -> int:
+    """Draw a branching section from ``y`` down and return the y below it: the edges first, then the boxes over them."""
+    layout = plan.layout
+    tops = []
+    for row_height in plan.row_heights:
+        tops.append(y)
+        y += row_height + SVG_STEP_GAP
+    box_width = SVG_GRAPH_COLUMN - 40
+
+    def x_of(node_id):
+        return round(center + layout.x(node_id) * SVG_GRAPH_COLUMN)
+
+    def box_height(node_id):
+        return _step_height(*plan.lines[node_id])
+
+    for index, (source, target, label) in enumerate(plan.edges):
+        route = layout.routes[index]
+        top = tops[layout.position[source][0]]
+        if source == target:
+            right = x_of(source) + box_width // 2
+            write(f'<path d="M{right},{top + 12} c 30,0 30,24 0,24" fill="none" stroke="#333" stroke-width="2" marker-end="url(#arrow)"/>\n')
+            continue
+        upwards = index in layout.reversed_edges
+        # Leave the source through its bottom (or top, for a loop back) and pass each layer in between top to bottom
+        points = [(x_of(source), top if upwards else top + box_height(source))]
+        for dummy in route[1:-1]:
+            layer_index = layout.position[dummy][0]
+            span_points = [(x_of(dummy), tops[layer_index]), (x_of(dummy), tops[layer_index] + plan.row_heights[layer_index])]
+            points.extend(reversed(span_points) if upwards else span_points)
+        target_top = tops[layout.position[target][0]]
+        points.append((x_of(target), target_top + box_height(target) if upwards else target_top))
+        dash = ' stroke-dasharray="6,4"' if upwards else ""
+        write(f'<polyline points="{" ".join(f"{px},{py}" for px, py in points)}" fill="none" stroke="#333" stroke-width="2"{dash} '
+              'marker-end="url(#arrow)"/>\n')
+        if label:
+            (x1, y1), (x2, y2) = points[0], points[1]
+            write(f'<text x="{(x1 + x2) // 2 + 6}" y="{(y1 + y2) // 2 + 4}" font-size="11" fill="#0C6C98">{xml_escape(label)}</text>\n')
+
+    for layer_index, layer in enumerate(layout.layers):
+        for node_id in layer:
+            if isinstance(node_id, Dummy):
+                continue
+            x, top = x_of(node_id), tops[layer_index]
+            decision = plan.nodes[node_id]["kind"] == "decision"
+            style = 'fill="#fff" stroke="#0C6C98" stroke-width="2"' if decision else 'fill="#f0f0f0" stroke="#ddd"'
+            write(f'<g><rect x="{x - box_width // 2}" y="{top}" width="{box_width}" height="{box_height(node_id)}" rx="10" {style}/>')
+            _write_svg_text(write, x - box_width // 2 + 10, top + 20, *plan.lines[node_id], center=x,
+                            title_fill="#0C6C98" if decision else "#333")
+            write("</g>\n")
+    return y - SVG_STEP_GAP
+
+
+def write_svg(fp, sections: Sequence[Section], arrow_rows: Iterable[ArrowRow] = ()) -> None:
+    """Write a standalone SVG: the arrow chart rows, then each process as a column of boxes joined by arrows.
+
+    The steps are measured in a first pass so the document height is known up front;
+    only line counts are kept, never the drawing itself. Branching sections are laid
+    out in that pass too, and widen the drawing if their layers need more room.
+    """
+    write = fp.write
+    rows = list(arrow_rows)
+    sections = list(sections)
+    plans = [None if graph is None else _GraphPlan(graph) for _, _, graph in sections]
+    height = _svg_height(sections, plans, rows)
+    width = max([SVG_WIDTH] + [plan.width for plan in plans if plan is not None])
+    write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+          'font-family="Arial, sans-serif">\n')
+    write('<defs><marker id="arrow" viewBox="0 0 10 10" refX="5" refY="5" markerWidth="8" markerHeight="8" orient="auto">'
+          '<path d="M0,0 L10,5 L0,10 z" fill="#333"/></marker></defs>\n')
+
+    y = SVG_MARGIN
+    for title, content in rows:
+        write(f'<g><rect x="{SVG_MARGIN}" y="{y}" width="190" height="{SVG_ARROW_ROW_HEIGHT}" rx="10" fill="#0C6C98"/>'
+              f'<text x="{SVG_MARGIN + 95}" y="{y + SVG_ARROW_ROW_HEIGHT // 2 + 5}" text-anchor="middle" fill="white" '
+              f'font-weight="bold" font-size="12">{xml_escape(title)}</text>')
+        content_x = SVG_MARGIN + 190
+        write(f'<polygon points="{content_x},{y} {content_x + 300},{y} {content_x + 370},{y + SVG_ARROW_ROW_HEIGHT // 2} '
+              f'{content_x + 300},{y + SVG_ARROW_ROW_HEIGHT} {content_x},{y + SVG_ARROW_ROW_HEIGHT}" fill="#D3D3D3"/>')
+        content_lines = wrap(content, 48)[:4] or [""]
+        text_y = y + (SVG_ARROW_ROW_HEIGHT - len(content_lines) * 14) // 2 + 11
+        write(f'<text x="{content_x + 10}" y="{text_y}" font-size="11" fill="black">')
+        for line_index, line in enumerate(content_lines):
+            write(f'<tspan x="{content_x + 10}" dy="{0 if line_index == 0 else 14}">{xml_escape(line)}</tspan>')
+        write("</text></g>\n")
+        y += SVG_ARROW_ROW_HEIGHT + 20
+
+    center, box_width = width // 2, SVG_WIDTH - 2 * SVG_MARGIN
+    box_x = center - box_width // 2
+    for (title, steps, _), plan in zip(sections, plans):
+        y += 28
+        write(f'<text x="{SVG_MARGIN}" y="{y}" font-size="16" font-weight="bold" fill="#333">{xml_escape(title)}:</text>\n')
+        y += 12
+        if plan is not None:
+            y = _write_svg_graph(write, plan, y, center) + 20
+            continue
+        for step_index, step in enumerate(steps):
+            if step_index:
+                write(f'<line x1="{center}" y1="{y + 4}" x2="{center}" y2="{y + SVG_STEP_GAP - 8}" '
+                      'stroke="#333" stroke-width="2" marker-end="url(#arrow)"/>\n')
+                y += SVG_STEP_GAP
+            title_lines, description_lines = _step_lines(step)
+            box_height = _step_height(title_lines, description_lines)
+            write(f'<g><rect x="{box_x}" y="{y}" width="{box_width}" height="{box_height}" rx="10" fill="#f0f0f0" stroke="#ddd"/>')
+            _write_svg_text(write, box_x + 15, y + 20, title_lines, description_lines, center=center)
+            write("</g>\n")
+            y += box_height
+        y += 20
+    write("</svg>\n")
+
+
+WRITERS = {"mermaid": write_mermaid, "dot": write_dot, "svg": write_svg}
+
+
+def write_export(fp, fmt: str, sections: Sequence[Section], arrow_rows: Iterable[ArrowRow] = ()) -> None:
+    """Write the chart in ``fmt`` (one of FORMATS) to ``fp``."""
+    try:
+        writer = WRITERS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(WRITERS)}") from None
+    writer(fp, sections, arrow_rows)
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+from flowchart.cache import ResponseCache, make_cache_key, make_cache_scope
+from flowchart.models import FlowChartStep, get_system_prompt
+from flowchart.parsing import parse_steps
+from flowchart.retry import HedgePolicy, ahedged_call, hedged_call
+from flowchart.singleflight import inflight
+from flowchart.streaming import StepStreamParser
+from flowchart.tracing import bind_context, span
+from flowchart.usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Optional duplicate request for slow answers, configured by FLOWCHART_HEDGE_AFTER / FLOWCHART_HEDGE_PROVIDER
+DEFAULT_HEDGE = HedgePolicy.from_env()
+
+# Upper bound on LLM calls run at once for the processes of one document
+MAX_PARALLEL_PROCESSES = int(os.getenv("FLOWCHART_MAX_PARALLEL_PROCESSES", "8"))
+
+# Least similarity for an earlier answer to be offered as a draft while a new one is generated
+DRAFT_SIMILARITY = float(os.getenv("FLOWCHART_DRAFT_SIMILARITY", "0.5"))
+
+class InvalidResponseError(ValueError):
+    """The model answered, but no valid flow chart steps could be read from the answer."""
+
+def build_messages(explanation: str, system_prompt: Optional[str] = None) -> List[dict]:
+    """Build the chat messages sent to the model for a step explanation."""
+    return [
+        {
+            "role": "system",
+            "content": system_prompt or get_system_prompt()
+        },
+        {
+            "role": "user",
+            "content": explanation,
+        },
+    ]
+
+def _report_error(message: str) -> None:
+    logger.error(message)
+
+def _parse_or_raise(content: str) -> List[dict]:
+    with span("parse", bytes=len((content or "").encode("utf-8"))) as parse:
+        try:
+            steps, repaired = parse_steps(content or "")
+        except json.JSONDecodeError as e:
+            raise InvalidResponseError(f"JSON parsing error: {str(e)}") from e
+        parse.set(repaired=repaired, steps=len(steps))
+
+    if repaired:
+        logger.info("Repaired malformed JSON in model response")
+    if not steps:
+        raise InvalidResponseError("Title or description not found in response.")
+    return steps
+
+def parse_steps_response(content: str, on_error: Callable[[str], None] = _report_error) -> List[FlowChartStep]:
+    """Turn the model's JSON answer into a list of step dicts, repairing malformed JSON where possible."""
+    try:
+        return _parse_or_raise(content)
+    except InvalidResponseError as e:
+        on_error(str(e))
+        return []
+
+def _completion_kwargs(stream: bool = False) -> dict:
+    return dict(
+        temperature=0,
+        stream=stream,
+        response_format={"type": "json_object"},
+    )
+
+def _message_bytes(messages: List[dict]) -> int:
+    return sum(len(message["content"].encode("utf-8")) for message in messages)
+
+def _request_steps(provider, explanation: str, on_usage: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    messages = build_messages(explanation)
+    with span("llm.request", provider=provider.name, model=provider.model, prompt_bytes=_message_bytes(messages)) as request:
+        chat_completion = provider.complete(messages, **_completion_kwargs())
+        content = chat_completion.choices[0].message.content
+        # Recorded per request, so a hedged duplicate that loses is still counted
+        usage = record_usage(provider.model, chat_completion, on_usage)
+        request.set(response_bytes=len((content or "").encode("utf-8")), **(usage or {}))
+    return _parse_or_raise(content)
+
+async def _arequest_steps(provider, explanation: str, on_usage: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    messages = build_messages(explanation)
+    with span("llm.request", provider=provider.name, model=provider.model, prompt_bytes=_message_bytes(messages)) as request:
+        chat_completion = await provider.acomplete(messages, **_completion_kwargs())
+        content = chat_completion.choices[0].message.content
+        usage = record_usage(provider.model, chat_completion, on_usage)
+        request.set(response_bytes=len((content or "").encode("utf-8")), **(usage or {}))
+    return _parse_or_raise(content)
+
+def _lookup_cache(cache: ResponseCache, cache_key: str, explanation: str, scope: str) -> Optional[List[dict]]:
+    """Cached steps for this exact explanation, or else for a near duplicate above the cache's reuse threshold."""
+    with span("cache.lookup") as lookup:
+        cached_steps = cache.get(cache_key)
+        if not cached_steps:
+            match = cache.find_similar(explanation, scope)
+            if match is not None:
+                similarity, cached_steps = match
+                lookup.set(similarity=round(similarity, 3))
+        lookup.set(hit=bool(cached_steps))
+    return cached_steps
+
+def find_similar_steps(explanation: str, provider, cache: Optional[ResponseCache],
+                       min_similarity: float = DRAFT_SIMILARITY) -> Optional[Tuple[float, List[dict]]]:
+    """The steps generated earlier for the most similar explanation, with its similarity, to show as a draft."""
+    if cache is None:
+        return None
+    with span("cache.similar") as lookup:
+        match = cache.find_similar(explanation, make_cache_scope(provider.model, get_system_prompt()), min_similarity)
+        lookup.set(hit=match is not None)
+    return match
+
+def generate_flow_chart_steps(explanation: str, provider, cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                              on_error: Callable[[str], None] = _report_error,
+                              hedge: Optional[HedgePolicy] = DEFAULT_HEDGE,
+                              on_usage: Optional[Callable[[dict], None]] = None) -> List[FlowChartStep]:
+    """Generate flow chart steps for ``explanation`` with an LLM provider, serving repeats from ``cache``.
+
+    With a ``hedge`` policy, a slow request is duplicated and the first valid answer wins.
+    ``on_usage`` is called with the token counts of every request that reports them.
+    """
+    # Identical explanations at temperature 0 give the same answer, so serve repeats (and near repeats) from the cache
+    cache_key = make_cache_key(explanation, provider.model, get_system_prompt())
+    scope = make_cache_scope(provider.model, get_system_prompt())
+    if cache is not None and use_cache:
+        cached_steps = _lookup_cache(cache, cache_key, explanation, scope)
+        if cached_steps:
+            return cached_steps
+
+    def request():
+        steps = hedged_call(lambda target: _request_steps(target, explanation, on_usage), provider, hedge)
+        # Cached before the call is released, so a request arriving just after it finds the answer
+        if steps and cache is not None:
+            cache.set(cache_key, steps, explanation, scope)
+        return steps
+
+    try:
+        # Concurrent identical requests, e.g. from other sessions, wait for this one rather than call the LLM again
+        with span("llm.call") as call:
+            steps, shared = inflight.do(cache_key, request)
+            call.set(shared=shared)
+    except InvalidResponseError as e:
+        on_error(str(e))
+        return []
+    except Exception as e:
+        on_error(f"Error generating flow chart steps: {str(e)}")
+        return []
+    return steps
+
+async def agenerate_flow_chart_steps(explanation: str, provider, cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                                     on_error: Callable[[str], None] = _report_error,
+                                     hedge: Optional[HedgePolicy] = DEFAULT_HEDGE,
+                                     on_usage: Optional[Callable[[dict], None]] = None) -> List[FlowChartStep]:
+    """Async counterpart of generate_flow_chart_steps, using the provider's async client."""
+    cache_key = make_cache_key(explanation, provider.model, get_system_prompt())
+    scope = make_cache_scope(provider.model, get_system_prompt())
+    if cache is not None and use_cache:
+        cached_steps = _lookup_cache(cache, cache_key, explanation, scope)
+        if cached_steps:
+            return cached_steps
+
+    async def request():
+        steps = await ahedged_call(lambda target: _arequest_steps(target, explanation, on_usage), provider, hedge)
+        if steps and cache is not None:
+            cache.set(cache_key, steps, explanation, scope)
+        return steps
+
+    try:
+        with span("llm.call") as call:
+            steps, shared = await inflight.ado(cache_key, request)
+            call.set(shared=shared)
+    except InvalidResponseError as e:
+        on_error(str(e))
+        return []
+    except Exception as e:
+        on_error(f"Error generating flow chart steps: {str(e)}")
+        return []
+    return steps
+
+def _process_error_reporter(title: str, on_error: Callable[[str], None]) -> Callable[[str], None]:
+    return lambda message: on_error(f"{title}: {message}")
+
+def generate_process_steps(processes: List[dict], provider, cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                           on_error: Callable[[str], None] = _report_error,
+                           hedge: Optional[HedgePolicy] = DEFAULT_HEDGE,
+                           on_usage: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """Generate the steps of several processes for one document, one LLM call each, all in flight at once.
+
+    ``processes`` are ``{"title": ..., "explanation": ...}`` dicts. Returns ``{"title": ..., "steps": [...]}``
+    dicts in the same order, as RenderHTML's ``processes`` expects, after roughly one LLM latency rather than
+    one per process. ``on_error`` and ``on_usage`` are called from worker threads, prefixed with the process title.
+    """
+    if len(processes) <= 1:
+        return [{"title": process["title"],
+                 "steps": generate_flow_chart_steps(process["explanation"], provider, cache, use_cache,
+                                                    _process_error_reporter(process["title"], on_error), hedge, on_usage)}
+                for process in processes]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(len(processes), MAX_PARALLEL_PROCESSES), thread_name_prefix="llm-process") as pool:
+        futures = [
+            pool.submit(bind_context(generate_flow_chart_steps), process["explanation"], provider, cache, use_cache,
+                        _process_error_reporter(process["title"], on_error), hedge, on_usage)
+            for process in processes
+        ]
+        return [{"title": process["title"], "steps": future.result()} for process, future in zip(processes, futures)]
+
+async def agenerate_process_steps(processes: List[dict], provider, cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                                  on_error: Callable[[str], None] = _report_error,
+                                  hedge: Optional[HedgePolicy] = DEFAULT_HEDGE,
+                                  on_usage: Optional[Callable[[dict], None]] = None,
+                                  limit: Optional[asyncio.Semaphore] = None) -> List[dict]:
+    """Async counterpart of generate_process_steps; the calls run concurrently on the event loop.
+
+    ``limit`` caps the calls in flight when it is shared with other reports, as in the batch CLI.
+    """
+    async def generate(process):
+        steps = agenerate_flow_chart_steps(process["explanation"], provider, cache, use_cache,
+                                           _process_error_reporter(process["title"], on_error), hedge, on_usage)
+        if limit is None:
+            return await steps
+        async with limit:
+            return await steps
+
+    results = await asyncio.gather(*(generate(process) for process in processes))
+    return [{"title": process["title"], "steps": steps} for process, steps in zip(processes, results)]
+
+def stream_flow_chart_steps(explanation: str, provider, cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                            on_error: Callable[[str], None] = _report_error,
+                            on_usage: Optional[Callable[[dict], None]] = None) -> Iterator[dict]:
+    """Yield flow chart steps one by one as soon as the model finishes each of them."""
+    cache_key = make_cache_key(explanation, provider.model, get_system_prompt())
+    scope = make_cache_scope(provider.model, get_system_prompt())
+    if cache is not None and use_cache:
+        cached_steps = _lookup_cache(cache, cache_key, explanation, scope)
+        if cached_steps:
+            yield from cached_steps
+            return
+
+    # Join an identical request already in flight; its steps arrive all at once when it finishes
+    try:
+        with span("llm.call") as call:
+            flight, shared_steps = inflight.lead_or_wait(cache_key)
+            call.set(shared=flight is None)
+    except InvalidResponseError as e:
+        on_error(str(e))
+        return
+    except Exception as e:
+        on_error(f"Error generating flow chart steps: {str(e)}")
+        return
+    if flight is None:
+        yield from shared_steps
+        return
+
+    steps = []
+    messages = build_messages(explanation)
+    try:
+        with span("llm.stream", provider=provider.name, model=provider.model, prompt_bytes=_message_bytes(messages)) as request:
+            try:
+                stream = provider.complete(messages, **_completion_kwargs(stream=True))
+
+                parser = StepStreamParser()
+                response_bytes = 0
+                for chunk in stream:
+                    # Usage arrives on the final chunk, which may carry no content
+                    usage = record_usage(provider.model, chunk, on_usage)
+                    if usage:
+                        request.set(**usage)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    response_bytes += len(delta.encode("utf-8"))
+                    for step in parser.feed(delta):
+                        if not steps:
+                            request.set(first_step_ms=request.elapsed_ms())
+                        steps.append(step)
+                        yield step
+
+                # Recover whatever the incremental pass could not, e.g. from truncated output
+                for step in parser.finish():
+                    steps.append(step)
+                    yield step
+                request.set(response_bytes=response_bytes, steps=len(steps))
+
+            except Exception as e:
+                request.set(error=str(e))
+                inflight.release(cache_key, flight, error=e)
+                on_error(f"Error generating flow chart steps: {str(e)}")
+                return
+
+        if not steps:
+            error = InvalidResponseError("Title or description not found in response.")
+            inflight.release(cache_key, flight, error=error)
+            on_error(str(error))
+            return
+        if cache is not None:
+            cache.set(cache_key, steps, explanation, scope)
+        inflight.release(cache_key, flight, steps)
+    finally:
+        if not flight.done():
+            # Abandoned part way, e.g. the caller stopped reading; whoever was waiting makes the call instead
+            inflight.release(cache_key, flight)
@@ -0,0 +1,221 @@
+"""Layered (Sugiyama-style) layout for branching flow charts.
+
+The graph is laid out top to bottom in four passes:
+
+1. cycles are broken by reversing the back edges found by a depth-first search;
+2. nodes are assigned to layers by longest path from the sources;
+3. edges spanning several layers get a dummy node in every layer they cross;
+4. the order within each layer is improved by barycenter sweeps, keeping the
+   ordering with the fewest edge crossings.
+
+The layout needs only node ids and (source, target) pairs, so this module has
+no dependencies and works for FlowChartGraph, its plain-dict form or any other graph.
+"""
+from collections import defaultdict
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+# Down-and-up sweep pairs tried before giving up on further crossing reduction
+MAX_SWEEPS = 12
+
+
+class Dummy(tuple):
+    """Placeholder for an edge passing through a layer: (edge index, step along the edge)."""
+
+    __slots__ = ()
+
+    def __new__(cls, edge_index: int, step: int):
+        return super().__new__(cls, (edge_index, step))
+
+
+class LayeredLayout:
+    """Where each node of a graph goes.
+
+    ``layers`` lists node ids top to bottom, left to right, including Dummy
+    placeholders. ``routes[i]`` is the chain of ids edge ``i`` passes through,
+    from its source to its target. ``reversed_edges`` are the edges that point
+    upwards (loops back to an earlier step).
+    """
+
+    def __init__(self, layers, routes, reversed_edges, crossings):
+        self.layers = layers
+        self.routes = routes
+        self.reversed_edges = reversed_edges
+        self.crossings = crossings
+        self.position = {node: (layer_index, order) for layer_index, layer in enumerate(layers) for order, node in enumerate(layer)}
+
+    def x(self, node) -> float:
+        """Horizontal position in column widths, with every layer centred on 0."""
+        layer_index, order = self.position[node]
+        return order - (len(self.layers[layer_index]) - 1) / 2.0
+
+    @property
+    def width(self) -> int:
+        return max((len(layer) for layer in self.layers), default=0)
+
+
+def graph_elements(graph) -> Tuple[List[dict], List[Tuple[str, str, str]]]:
+    """The nodes and edges of a FlowChartGraph, or of the same thing as plain dicts (e.g. parsed JSON).
+
+    Nodes come back as dicts with id, title, description and kind; edges as
+    (source, target, label) tuples. Raises ValueError for an edge to an unknown node.
+    """
+    if hasattr(graph, "model_dump"):
+        graph = graph.model_dump()
+    nodes = [{"id": str(node["id"]), "title": node.get("title", ""), "description": node.get("description", ""),
+              "kind": node.get("kind") or "step"} for node in graph.get("nodes") or ()]
+    ids = {node["id"] for node in nodes}
+    edges = []
+    for edge in graph.get("edges") or ():
+        source, target = str(edge["source"]), str(edge["target"])
+        if source not in ids or target not in ids:
+            raise ValueError(f"Edge {source!r} -> {target!r} refers to an unknown node")
+        edges.append((source, target, edge.get("label") or ""))
+    return nodes, edges
+
+
+def is_chain(nodes: Sequence[dict], edges: Sequence[Tuple[str, str, str]]) -> bool:
+    """True if the graph is plain steps joined one after another in node order, with no decisions or edge labels."""
+    if any(node.get("kind", "step") != "step" for node in nodes) or len(edges) != max(0, len(nodes) - 1):
+        return False
+    return all(source == a["id"] and target == b["id"] and not label
+               for (source, target, label), a, b in zip(edges, nodes, nodes[1:]))
+
+
+def _back_edges(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]]) -> set:
+    """Indices of the edges that close a cycle in a depth-first search from each node in input order."""
+    outgoing = defaultdict(list)
+    for index, (source, target) in enumerate(edges):
+        outgoing[source].append((target, index))
+
+    back, state = set(), {}  # state: 1 while on the DFS stack, 2 once finished
+    for root in nodes:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(outgoing[root]))]
+        while stack:
+            node, children = stack[-1]
+            for target, index in children:
+                if state.get(target) == 1:
+                    back.add(index)
+                elif target not in state:
+                    state[target] = 1
+                    stack.append((target, iter(outgoing[target])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return back
+
+
+def _assign_layers(nodes: Sequence[Hashable], edges: List[Tuple[Hashable, Hashable]]) -> Dict[Hashable, int]:
+    """Longest-path layering of an acyclic graph: every edge points at least one layer down."""
+    indegree = {node: 0 for node in nodes}
+    outgoing = defaultdict(list)
+    for source, target in edges:
+        outgoing[source].append(target)
+        indegree[target] += 1
+    layer = {node: 0 for node in nodes}
+    ready = [node for node in nodes if indegree[node] == 0]
+    ready.reverse()  # Pop in input order
+    while ready:
+        node = ready.pop()
+        for target in outgoing[node]:
+            layer[target] = max(layer[target], layer[node] + 1)
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                ready.append(target)
+    return layer
+
+
+def _count_crossings(position: Dict, lower_size: int, links: List[Tuple[Hashable, Hashable]]) -> int:
+    """Crossings between two adjacent layers, by counting inversions with a Fenwick tree in O(E log V)."""
+    pairs = sorted((position[upper], position[lower]) for upper, lower in links)
+    size = lower_size + 1
+    tree = [0] * (size + 1)
+    crossings = seen = 0
+    for _, lower in pairs:
+        # Links already seen that end to the right of this one cross it
+        index, not_greater = lower + 1, 0
+        while index > 0:
+            not_greater += tree[index]
+            index -= index & -index
+        crossings += seen - not_greater
+        index = lower + 1
+        while index <= size:
+            tree[index] += 1
+            index += index & -index
+        seen += 1
+    return crossings
+
+
+def _total_crossings(layers, down_links, position) -> int:
+    return sum(_count_crossings(position, len(layers[index + 1]), down_links[index]) for index in range(len(layers) - 1))
+
+
+def _sweep(layers, neighbours, layer_range, position):
+    """Reorder each layer in ``layer_range`` by the mean position of its neighbours in the layer swept before it."""
+    for layer_index in layer_range:
+        keyed = []
+        for order, node in enumerate(layers[layer_index]):
+            linked = neighbours.get(node)
+            # Nodes without neighbours there keep their place
+            keyed.append(((sum(position[other] for other in linked) / len(linked)) if linked else float(order), order, node))
+        keyed.sort()
+        layer = layers[layer_index] = [node for _, _, node in keyed]
+        for order, node in enumerate(layer):
+            position[node] = order
+
+
+def layered_layout(nodes: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]], max_sweeps: int = MAX_SWEEPS) -> LayeredLayout:
+    """Lay out a directed graph (cycles allowed) in layers with few edge crossings."""
+    nodes = list(dict.fromkeys(nodes))
+    reversed_edges = _back_edges(nodes, edges)
+    acyclic = []
+    for index, (source, target) in enumerate(edges):
+        if source == target:
+            continue  # A self loop needs no place of its own
+        acyclic.append((target, source) if index in reversed_edges else (source, target))
+    layer_of = _assign_layers(nodes, acyclic)
+
+    layers = [[] for _ in range(max(layer_of.values(), default=-1) + 1)]
+    for node in nodes:
+        layers[layer_of[node]].append(node)
+
+    # Split long edges into one-layer hops through dummy nodes
+    above, below = defaultdict(list), defaultdict(list)
+    down_links = [[] for _ in range(max(0, len(layers) - 1))]
+    routes = []
+    for index, (source, target) in enumerate(edges):
+        if source == target:
+            routes.append([source, target])
+            continue
+        upper, lower = (target, source) if index in reversed_edges else (source, target)
+        chain = [upper]
+        for step, layer_index in enumerate(range(layer_of[upper] + 1, layer_of[lower]), start=1):
+            dummy = Dummy(index, step)
+            layers[layer_index].append(dummy)
+            chain.append(dummy)
+        chain.append(lower)
+        for offset, (a, b) in enumerate(zip(chain, chain[1:])):
+            down_links[layer_of[upper] + offset].append((a, b))
+            below[a].append(b)
+            above[b].append(a)
+        routes.append(chain[::-1] if index in reversed_edges else chain)
+
+    # One position table for every layer, kept current as the sweeps reorder them
+    position = {node: order for layer in layers for order, node in enumerate(layer)}
+    best = [list(layer) for layer in layers]
+    best_crossings = _total_crossings(layers, down_links, position)
+    stale = 0
+    for _ in range(max_sweeps):
+        if best_crossings == 0 or stale >= 2:
+            break
+        _sweep(layers, above, range(1, len(layers)), position)
+        _sweep(layers, below, range(len(layers) - 2, -1, -1), position)
+        crossings = _total_crossings(layers, down_links, position)
+        if crossings < best_crossings:
+            best, best_crossings, stale = [list(layer) for layer in layers], crossings, 0
+        else:
+            stale += 1
+    return LayeredLayout(best, routes, reversed_edges, best_crossings)
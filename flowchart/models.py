@@ -0,0 +1,115 @@
+import json
+import os
+from functools import lru_cache
+from typing import List, Literal
+from pydantic import BaseModel, field_validator, model_validator
+from flowchart.layout import is_chain
+
+class FlowChartStep(BaseModel):
+    title: str
+    description: str
+
+    @field_validator("title", "description", mode="before")
+    @classmethod
+    def _join_points(cls, value):
+        # Models sometimes answer with the key points as a list instead of one string
+        if isinstance(value, (list, tuple)):
+            return ", ".join(str(point).strip() for point in value)
+        if isinstance(value, (int, float)):
+            return str(value)
+        return value
+
+# The answer the model is asked for; no docstring, since it would be sent as the schema's description
+class FlowChartSteps(BaseModel):
+    steps: List[FlowChartStep]
+
+class FlowChartNode(FlowChartStep):
+    """A step in a branching flow chart; decision nodes are drawn as diamonds with labelled outgoing edges."""
+    id: str
+    kind: Literal["step", "decision"] = "step"
+
+class FlowChartEdge(BaseModel):
+    source: str
+    target: str
+    label: str = ""
+
+class FlowChartGraph(BaseModel):
+    """A flow chart as nodes and edges, so decisions, loops and parallel branches can be expressed.
+
+    Edges may form cycles (loops back to an earlier step); the layout engine handles them.
+    """
+    nodes: List[FlowChartNode]
+    edges: List[FlowChartEdge] = []
+
+    @model_validator(mode="after")
+    def _check_edges(self):
+        ids = set()
+        for node in self.nodes:
+            if node.id in ids:
+                raise ValueError(f"Duplicate node id {node.id!r}")
+            ids.add(node.id)
+        for edge in self.edges:
+            if edge.source not in ids or edge.target not in ids:
+                raise ValueError(f"Edge {edge.source!r} -> {edge.target!r} refers to an unknown node")
+        return self
+
+    @classmethod
+    def from_steps(cls, steps) -> "FlowChartGraph":
+        """The plain step list as a graph: one node per step, each followed by the next."""
+        nodes = [FlowChartNode(id=f"s{index}", title=step["title"], description=step["description"])
+                 for index, step in enumerate(steps, start=1)]
+        edges = [FlowChartEdge(source=a.id, target=b.id) for a, b in zip(nodes, nodes[1:])]
+        return cls(nodes=nodes, edges=edges)
+
+    def is_linear(self) -> bool:
+        """True if the graph is a single unlabelled chain in node order, which renders exactly like a step list."""
+        return is_chain([{"id": node.id, "kind": node.kind} for node in self.nodes],
+                        [(edge.source, edge.target, edge.label) for edge in self.edges])
+
+    def steps(self) -> List[dict]:
+        return [{"title": node.title, "description": node.description} for node in self.nodes]
+
+MODEL_NAME = "llama3-8b-8192"
+
+# Bump when the instructions change, so cached answers from the old prompt are not reused
+PROMPT_VERSION = 2
+
+# The compact encoding sends the schema without indentation or per-field titles
+COMPACT_PROMPT = os.getenv("FLOWCHART_COMPACT_PROMPT", "1") != "0"
+
+PROMPT_INSTRUCTIONS = {
+    1: ("Please provide a very detailed step-by-step guide with 6 to 10 steps. Each step should have a title and a description, "
+        "description shall include key points and it shall have 4-5 points for each title, "
+        "without new lines. Ensure the JSON is correctly formatted with commas separating the fields, "
+        "and avoid any extra fields or incorrect structure. "),
+    2: ("Please provide a very detailed step-by-step guide with 6 to 10 steps, as a JSON object with a \"steps\" list. "
+        "Each step should have a title and a description, "
+        "description shall include key points and it shall have 4-5 points for each title, "
+        "without new lines. Ensure the JSON is correctly formatted with commas separating the fields, "
+        "and avoid any extra fields or incorrect structure. "),
+}
+
+# The schema sent with each version of the instructions; version 1 described a single step
+PROMPT_SCHEMAS = {
+    1: FlowChartStep,
+    2: FlowChartSteps,
+}
+
+def _strip_titles(schema):
+    if isinstance(schema, dict):
+        return {key: _strip_titles(value) for key, value in schema.items() if key != "title" or not isinstance(value, str)}
+    if isinstance(schema, list):
+        return [_strip_titles(value) for value in schema]
+    return schema
+
+@lru_cache(maxsize=None)
+def get_system_prompt(version: int = PROMPT_VERSION, compact: bool = COMPACT_PROMPT) -> str:
+    """Build the system prompt once per (version, encoding) and reuse it for every request."""
+    schema = PROMPT_SCHEMAS[version].model_json_schema()
+    if compact:
+        encoded_schema = json.dumps(_strip_titles(schema), separators=(",", ":"))
+    else:
+        encoded_schema = json.dumps(schema, indent=2)
+    return PROMPT_INSTRUCTIONS[version] + f"The JSON object must use the schema: {encoded_schema}"
+
+SYSTEM_PROMPT = get_system_prompt()
@@ -0,0 +1,209 @@
+import json
+import logging
+import re
+from typing import List, Optional, Tuple
+from flowchart.tracing import span
+
+logger = logging.getLogger(__name__)
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.I)
+_VALUE_START = set('"{[-0123456789tfn')
+
+
+def _next_significant(text: str, index: int) -> int:
+    while index < len(text) and text[index] in " \t\r\n":
+        index += 1
+    return index
+
+
+def _is_closing_quote(text: str, index: int, container: Optional[str]) -> bool:
+    """Decide whether the quote at ``index`` ends the current string or is a stray quote inside it."""
+    following = _next_significant(text, index + 1)
+    if following >= len(text):
+        return True
+    char = text[following]
+    if char in ":}]":
+        return True
+    if char == ",":
+        after = _next_significant(text, following + 1)
+        if after >= len(text):
+            return True
+        # Inside an object a comma must be followed by the next key, inside a list by a value
+        expected = '"}' if container == "{" else _VALUE_START | {"]"}
+        return text[after] in expected
+    return False
+
+
+def _scan(text: str):
+    """Return the open containers, whether a string is still open, and the positions of commas outside strings."""
+    stack, commas = [], []
+    in_string = escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            commas.append(index)
+    return stack, in_string, commas
+
+
+def _close(text: str) -> str:
+    stack, in_string, _ = _scan(text)
+    if in_string:
+        text = text[:-1] if text.endswith("\\") else text
+        text += '"'
+    text = text.rstrip().rstrip(",").rstrip()
+    return text + "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+def repair_json(text: str) -> str:
+    """Fix the defects the model commonly produces so the answer can be decoded without a new request.
+
+    Handles surrounding prose and code fences, trailing commas, unescaped quotes and
+    raw newlines inside strings, and output truncated mid-document (open strings and
+    containers are closed, and a dangling half-written member is dropped).
+    """
+    text = _CODE_FENCE.sub("", text)
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out, stack = [], []
+    in_string = escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+                out.append(char)
+            elif char == "\\":
+                escape = True
+                out.append(char)
+            elif char == '"':
+                if _is_closing_quote(text, index, stack[-1] if stack else None):
+                    in_string = False
+                    out.append(char)
+                else:
+                    out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1] in " \t\r\n,":
+                out.pop()
+            if stack:
+                opener = stack.pop()
+                out.append("}" if opener == "{" else "]")
+            if not stack:
+                break  # Ignore anything after the document
+        else:
+            out.append(char)
+
+    repaired = "".join(out)
+    if not stack and not in_string:
+        return repaired
+
+    # Truncated: close what is open, trimming back one member at a time until it decodes
+    candidate = _close(repaired)
+    for _ in range(64):
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            _, _, commas = _scan(repaired)
+            if not commas:
+                return candidate
+            repaired = repaired[:commas[-1]]
+            candidate = _close(repaired)
+    return candidate
+
+
+def extract_steps(data) -> List[dict]:
+    """Collect step-like objects from any of the shapes the model returns.
+
+    Accepts a single ``{title, description}`` object, a bare list of steps, or a
+    wrapper object such as ``{"steps": [...]}`` under any key. A wrapper may have
+    a title and description of its own; an object is only a step when it has both
+    and holds no steps inside it (see ``is_step``).
+    """
+    if isinstance(data, list):
+        steps = []
+        for item in data:
+            steps.extend(extract_steps(item))
+        return steps
+    if isinstance(data, dict):
+        nested = _nested_steps(data)
+        if nested or "title" not in data or "description" not in data:
+            return nested
+        return [data]
+    return []
+
+
+def _nested_steps(data: dict) -> List[dict]:
+    steps = []
+    for value in data.values():
+        if isinstance(value, (list, dict)):
+            steps.extend(extract_steps(value))
+    return steps
+
+
+def is_step(data) -> bool:
+    """Whether a decoded object is itself a step rather than a wrapper around steps.
+
+    The streaming parser applies the same rule to each object as it closes, so
+    both paths find the same steps in the same order.
+    """
+    return isinstance(data, dict) and "title" in data and "description" in data and not _nested_steps(data)
+
+
+def validate_steps(candidates: List[dict]) -> List[dict]:
+    """Validate each candidate through FlowChartStep and return the valid ones as plain dicts."""
+    from pydantic import ValidationError
+    from flowchart.models import FlowChartStep
+
+    steps = []
+    with span("validate", candidates=len(candidates)) as validation:
+        for candidate in candidates:
+            try:
+                steps.append(FlowChartStep.model_validate(candidate).model_dump())
+            except ValidationError as e:
+                logger.warning("Dropping invalid step %r: %s", candidate, e)
+        validation.set(valid=len(steps))
+    return steps
+
+
+def parse_steps(text: str) -> Tuple[List[dict], bool]:
+    """Parse the model's answer into validated steps.
+
+    Returns the steps and whether the text had to be repaired first. Raises
+    ``json.JSONDecodeError`` only if even the repaired text cannot be decoded.
+    """
+    repaired = False
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = json.loads(repair_json(text))
+        repaired = True
+    return validate_steps(extract_steps(data)), repaired
@@ -0,0 +1,69 @@
+import atexit
+import os
+import threading
+from io import BytesIO
+from typing import Iterable, List, Optional
+from flowchart.tracing import span
+
+# Number of worker processes used for PDF conversion; 0 means one per core, decided when the pool is created
+PDF_WORKERS = int(os.getenv("FLOWCHART_PDF_WORKERS", "0"))
+# The Streamlit process converts one user's document at a time, so it keeps a small pool
+UI_PDF_WORKERS = int(os.getenv("FLOWCHART_UI_PDF_WORKERS", "2"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def html_to_pdf_bytes(html: str) -> bytes:
+    """Convert an HTML document to PDF with xhtml2pdf in the current process."""
+    from xhtml2pdf import pisa
+
+    buffer = BytesIO()
+    result = pisa.CreatePDF(html, dest=buffer, encoding="utf-8")
+    if result.err:
+        raise ValueError(f"PDF conversion failed with {result.err} error(s)")
+    return buffer.getvalue()
+
+
+def get_pdf_pool(max_workers: Optional[int] = None):
+    """Return the process-wide ProcessPoolExecutor used for PDF conversion, creating it on first use.
+
+    The first caller sizes the pool: ``max_workers``, else PDF_WORKERS, else one worker per core.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            workers = max_workers or PDF_WORKERS or os.cpu_count() or 1
+            # Spawned workers do not inherit the Streamlit server's threads and locks
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown_pdf_pool)
+        return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def submit_pdf(html: str, max_workers: Optional[int] = None):
+    """Queue an HTML document for conversion and return a future resolving to the PDF bytes."""
+    return get_pdf_pool(max_workers).submit(html_to_pdf_bytes, html)
+
+
+def render_pdf(html: str, timeout: Optional[float] = None, max_workers: Optional[int] = None) -> bytes:
+    """Convert an HTML document to PDF in the worker pool and return the bytes."""
+    with span("pdf.convert", html_bytes=len(html.encode("utf-8"))) as conversion:
+        pdf_bytes = submit_pdf(html, max_workers).result(timeout=timeout)
+        conversion.set(pdf_bytes=len(pdf_bytes))
+    return pdf_bytes
+
+
+def render_pdfs(documents: Iterable[str]) -> List[bytes]:
+    """Convert many HTML documents in parallel, preserving their order."""
+    return list(get_pdf_pool().map(html_to_pdf_bytes, documents))
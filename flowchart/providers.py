@@ -0,0 +1,212 @@
+import logging
+import os
+import threading
+from typing import List, Optional
+from flowchart.ratelimit import RateLimiter, get_rate_limiter
+from flowchart.retry import RetryPolicy, acall_with_retries, call_with_retries
+
+logger = logging.getLogger(__name__)
+
+# Provider chain tried in order, as "name:model" pairs, e.g. "groq:llama3-8b-8192,openai:gpt-4o-mini"
+DEFAULT_PROVIDERS = os.getenv("FLOWCHART_PROVIDERS", "groq:llama3-8b-8192")
+
+# Connection pool shared by every LLM client in the process
+HTTP_MAX_CONNECTIONS = int(os.getenv("FLOWCHART_HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("FLOWCHART_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("FLOWCHART_HTTP_KEEPALIVE_EXPIRY", "120"))
+HTTP_TIMEOUT = float(os.getenv("FLOWCHART_HTTP_TIMEOUT", "60"))
+
+# API key and base URL environment variables for each backend
+BACKENDS = {
+    "groq": {"api_key_env": "GROQ_API_KEY", "base_url_env": "GROQ_BASE_URL"},
+    "openai": {"api_key_env": "OPENAI_API_KEY", "base_url_env": "OPENAI_BASE_URL"},
+}
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _http_settings():
+    import httpx
+
+    limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                          keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+    return dict(limits=limits, timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10.0))
+
+
+def get_http_client():
+    """Return the process-wide httpx.Client, so connections and TLS sessions are reused by every request."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(**_http_settings())
+        return _http_client
+
+
+class Provider:
+    """One chat-completions backend (Groq or OpenAI) and the model to call on it."""
+
+    def __init__(self, name: str, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 retry_policy: Optional[RetryPolicy] = None, rate_limiter: Optional[RateLimiter] = None):
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown LLM provider {name!r}; expected one of {', '.join(BACKENDS)}")
+        self.name = name
+        self.model = model
+        self.api_key = api_key or os.getenv(BACKENDS[name]["api_key_env"])
+        self.base_url = base_url or os.getenv(BACKENDS[name]["base_url_env"]) or None
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        # Shared by every Provider for the same model, since the API's limits are per model
+        self.rate_limiter = rate_limiter or get_rate_limiter(f"{name}:{model}")
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Provider({self.name}:{self.model})"
+
+    def _client_class(self, asynchronous: bool):
+        if self.name == "groq":
+            from groq import AsyncGroq, Groq
+            return AsyncGroq if asynchronous else Groq
+        from openai import AsyncOpenAI, OpenAI
+        return AsyncOpenAI if asynchronous else OpenAI
+
+    @property
+    def client(self):
+        """The SDK client, built once and bound to the shared connection pool."""
+        with self._lock:
+            if self._client is None:
+                # Retries are handled by complete() so that backoff honours our policy and Retry-After
+                self._client = self._client_class(False)(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                                         http_client=get_http_client())
+            return self._client
+
+    @property
+    def async_client(self):
+        """The async SDK client with its own pooled httpx.AsyncClient, for use inside one event loop."""
+        with self._lock:
+            if self._async_client is None:
+                import httpx
+
+                self._async_client = self._client_class(True)(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                                              http_client=httpx.AsyncClient(**_http_settings()))
+            return self._async_client
+
+    def _request_kwargs(self, kwargs: dict) -> dict:
+        """Add the options this backend needs to the completion arguments."""
+        if kwargs.get("stream") and self.name == "openai" and "stream_options" not in kwargs:
+            # OpenAI only reports token usage on a stream when asked; Groq always does
+            kwargs = dict(kwargs, stream_options={"include_usage": True})
+        return kwargs
+
+    def complete(self, messages: List[dict], **kwargs):
+        """Run a chat completion and return the SDK response (or stream when ``stream=True``).
+
+        Transient failures (429, 5xx, connection errors) are retried according to ``retry_policy``.
+        With a ``rate_limiter``, every attempt first waits for its turn within the request and token limits.
+        """
+        client = self.client
+        kwargs = self._request_kwargs(kwargs)
+        limiter = self.rate_limiter
+
+        def attempt():
+            request = lambda: client.chat.completions.create(messages=messages, model=self.model, **kwargs)
+            if limiter is None:
+                return request()
+            return limiter.call(request, limiter.estimate(messages, kwargs), kwargs.get("stream", False))
+
+        return call_with_retries(attempt, self.retry_policy, repr(self))
+
+    async def acomplete(self, messages: List[dict], **kwargs):
+        client = self.async_client
+        kwargs = self._request_kwargs(kwargs)
+        limiter = self.rate_limiter
+
+        async def attempt():
+            request = lambda: client.chat.completions.create(messages=messages, model=self.model, **kwargs)
+            if limiter is None:
+                return await request()
+            return await limiter.acall(request, limiter.estimate(messages, kwargs), kwargs.get("stream", False))
+
+        return await acall_with_retries(attempt, self.retry_policy, repr(self))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+class FailoverProvider:
+    """Try each provider in order and return the first successful response."""
+
+    def __init__(self, providers: List[Provider]):
+        if not providers:
+            raise ValueError("FailoverProvider needs at least one provider")
+        self.providers = providers
+
+    def __repr__(self):
+        return f"FailoverProvider({', '.join(f'{p.name}:{p.model}' for p in self.providers)})"
+
+    @property
+    def name(self):
+        return self.providers[0].name
+
+    @property
+    def model(self):
+        # Cache entries are keyed on the primary model; fallbacks answer in the same format
+        return self.providers[0].model
+
+    def complete(self, messages: List[dict], **kwargs):
+        last_error = None
+        for provider in self.providers:
+            try:
+                return provider.complete(messages, **kwargs)
+            except Exception as e:
+                logger.warning("%r failed, trying the next provider: %s", provider, e)
+                last_error = e
+        raise last_error
+
+    async def acomplete(self, messages: List[dict], **kwargs):
+        last_error = None
+        for provider in self.providers:
+            try:
+                return await provider.acomplete(messages, **kwargs)
+            except Exception as e:
+                logger.warning("%r failed, trying the next provider: %s", provider, e)
+                last_error = e
+        raise last_error
+
+    async def aclose(self):
+        for provider in self.providers:
+            await provider.aclose()
+
+
+def load_providers(spec: str = DEFAULT_PROVIDERS):
+    """Build a provider (with failover when several are listed) from a "name:model,name:model" spec."""
+    providers = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, model = entry.partition(":")
+        if not model:
+            raise ValueError(f"Provider entry {entry!r} must be written as name:model")
+        providers.append(Provider(name.strip().lower(), model.strip()))
+    if len(providers) == 1:
+        return providers[0]
+    return FailoverProvider(providers)
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider():
+    """Return the process-wide provider configured by FLOWCHART_PROVIDERS."""
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = load_providers()
+        return _default_provider
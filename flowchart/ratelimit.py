@@ -0,0 +1,326 @@
+"""Client-side rate limiting for LLM calls: token buckets for requests and tokens per minute, served by priority.
+
+Every call to a model first takes one request and its estimated tokens from
+that model's buckets, which refill continuously up to the per-minute limits.
+Calls that have to wait queue by priority, so an interactive Streamlit request
+goes ahead of batch work queued before it. Once the response reports its
+usage, the token estimate is corrected. A 429 holds every caller for the
+Retry-After the API asked for, instead of each one retrying into the limit.
+
+The buckets live in memory, shared by every session in the process, or in a
+SQLite file (FLOWCHART_RATE_LIMIT_STATE) shared by every process using it,
+e.g. the Streamlit server and batch jobs. The priority queue is per process;
+across processes, batch calls leave a share of each bucket
+(FLOWCHART_RATE_LIMIT_RESERVE) to interactive ones.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from flowchart.retry import is_rate_limited, retry_after_seconds
+from flowchart.tracing import span
+from flowchart.usage import usage_from_response
+
+# Priorities; lower is served first
+INTERACTIVE = 0
+BATCH = 10
+
+# Limits per model; 0 leaves that dimension unlimited, and with both at 0 calls are not limited at all
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("FLOWCHART_RATE_LIMIT_RPM", "0"))
+DEFAULT_TOKENS_PER_MINUTE = float(os.getenv("FLOWCHART_RATE_LIMIT_TPM", "0"))
+# SQLite file holding the buckets, to share them between processes; empty keeps them in this process
+DEFAULT_STATE_PATH = os.getenv("FLOWCHART_RATE_LIMIT_STATE", "")
+# Share of each bucket that calls below interactive priority leave untouched
+DEFAULT_INTERACTIVE_RESERVE = float(os.getenv("FLOWCHART_RATE_LIMIT_RESERVE", "0.2"))
+# Completion tokens assumed for a call until its usage is known
+DEFAULT_COMPLETION_TOKENS = int(os.getenv("FLOWCHART_RATE_LIMIT_COMPLETION_TOKENS", "800"))
+# Hold after a 429 that gives no Retry-After
+DEFAULT_PAUSE_SECONDS = 1.0
+
+# How often a queued asyncio task checks whether it is at the head of the queue
+_POLL_SECONDS = 0.05
+
+# The priority of LLM calls made by the current thread or asyncio task
+_priority = contextvars.ContextVar("flowchart_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Queue LLM calls made in this block (and in tasks or bound threads started from it) at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield level
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def estimate_tokens(messages: List[dict], max_tokens: Optional[int] = None, completion_tokens: int = DEFAULT_COMPLETION_TOKENS) -> int:
+    """Rough token count of a chat request: about four characters per prompt token plus the expected completion."""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return math.ceil(prompt_chars / 4) + (max_tokens or completion_tokens)
+
+
+class RateLimiter:
+    """Token buckets for one model's requests and tokens per minute, with a priority queue for waiting calls.
+
+    Both buckets start full, so up to a minute's allowance can go out at once.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 key: str = "default", state_path: Optional[str] = None, interactive_reserve: float = DEFAULT_INTERACTIVE_RESERVE,
+                 completion_tokens: int = DEFAULT_COMPLETION_TOKENS):
+        self.requests_per_minute = max(0.0, requests_per_minute)
+        self.tokens_per_minute = max(0.0, tokens_per_minute)
+        self.key = key
+        self.state_path = state_path or None
+        self.interactive_reserve = min(max(0.0, interactive_reserve), 1.0)
+        self.completion_tokens = completion_tokens
+        self._lock = threading.Lock()
+        self._turn = threading.Condition(self._lock)
+        self._queue: List[Tuple[int, int]] = []
+        self._tickets = itertools.count()
+        self._state = None  # (requests, tokens, updated, paused_until) when the buckets are kept in memory
+        self._conn = None
+        if self.state_path:
+            if self.state_path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.state_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY,"
+                " requests REAL NOT NULL,"
+                " tokens REAL NOT NULL,"
+                " updated REAL NOT NULL,"
+                " paused_until REAL NOT NULL)"
+            )
+
+    @classmethod
+    def from_env(cls, key: str = "default") -> Optional["RateLimiter"]:
+        """A limiter configured by FLOWCHART_RATE_LIMIT_*, or None when no limit is set."""
+        if DEFAULT_REQUESTS_PER_MINUTE <= 0 and DEFAULT_TOKENS_PER_MINUTE <= 0:
+            return None
+        return cls(key=key, state_path=DEFAULT_STATE_PATH)
+
+    def __repr__(self):
+        return f"RateLimiter({self.key}: {self.requests_per_minute:g} requests/min, {self.tokens_per_minute:g} tokens/min)"
+
+    def estimate(self, messages: List[dict], kwargs: dict) -> int:
+        """Tokens to take for a chat request made with ``kwargs``."""
+        return estimate_tokens(messages, kwargs.get("max_tokens"), self.completion_tokens)
+
+    # Bucket state; callers hold self._lock
+
+    def _update(self, change: Callable):
+        """Apply ``change(requests, tokens, now, paused_until) -> (new state or None, result)`` to the refilled buckets."""
+        if self._conn is None:
+            state, result = change(*self._refilled(self._state, time.time()))
+            if state is not None:
+                self._state = state
+            return result
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute("SELECT requests, tokens, updated, paused_until FROM buckets WHERE key = ?", (self.key,)).fetchone()
+            state, result = change(*self._refilled(row, time.time()))
+            if state is not None:
+                self._conn.execute("INSERT OR REPLACE INTO buckets (key, requests, tokens, updated, paused_until) VALUES (?, ?, ?, ?, ?)",
+                                   (self.key,) + state)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _refilled(self, state, now: float) -> Tuple[float, float, float, float]:
+        if state is None:
+            return self.requests_per_minute, self.tokens_per_minute, now, 0.0
+        requests, tokens, updated, paused_until = state
+        elapsed = max(0.0, now - updated)
+        return (min(self.requests_per_minute, requests + elapsed * self.requests_per_minute / 60.0),
+                min(self.tokens_per_minute, tokens + elapsed * self.tokens_per_minute / 60.0), now, paused_until)
+
+    def _shortfall(self, available: float, wanted: float, per_minute: float, level: int) -> float:
+        """Seconds until ``wanted`` can be taken from a bucket holding ``available``."""
+        if per_minute <= 0:
+            return 0.0
+        reserve = 0.0 if level <= INTERACTIVE else self.interactive_reserve * per_minute
+        needed = min(wanted + reserve, per_minute)  # A call larger than the bucket waits for a full one
+        return 0.0 if available >= needed else (needed - available) * 60.0 / per_minute
+
+    def _take(self, tokens: int, level: int) -> float:
+        """Take one request and ``tokens`` if they are available and return 0, or else the seconds to wait."""
+        def change(requests, available, now, paused_until):
+            if paused_until > now:
+                return None, paused_until - now
+            wait = max(self._shortfall(requests, 1, self.requests_per_minute, level),
+                       self._shortfall(available, tokens, self.tokens_per_minute, level))
+            if wait > 0:
+                return None, wait
+            if self.requests_per_minute > 0:
+                requests -= 1
+            if self.tokens_per_minute > 0:
+                available -= tokens
+            return (requests, available, now, paused_until), 0.0
+
+        return self._update(change)
+
+    # Queueing
+
+    def _enqueue(self) -> Tuple[int, int]:
+        ticket = (_priority.get(), next(self._tickets))
+        heapq.heappush(self._queue, ticket)
+        self._turn.notify_all()  # A queued call may have just lost its place at the head
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]) -> None:
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._turn.notify_all()
+
+    def _try(self, ticket: Tuple[int, int], tokens: int) -> Optional[float]:
+        """0 once the call at the head of the queue has its tokens, the seconds it must wait, or None when not at the head."""
+        return self._take(tokens, ticket[0]) if self._queue[0] == ticket else None
+
+    def acquire(self, tokens: int) -> float:
+        """Block until a request and ``tokens`` can be taken, at the current priority. Returns the seconds waited."""
+        with self._lock:
+            if not self._queue and self._take(tokens, _priority.get()) <= 0:
+                return 0.0
+        started = time.monotonic()
+        with span("llm.queue", priority=_priority.get(), tokens=tokens) as queue:
+            with self._lock:
+                ticket = self._enqueue()
+                try:
+                    while True:
+                        wait = self._try(ticket, tokens)
+                        if wait is not None and wait <= 0:
+                            break
+                        self._turn.wait(wait)
+                finally:
+                    self._dequeue(ticket)
+            waited = time.monotonic() - started
+            queue.set(waited_ms=round(waited * 1000.0, 1))
+        return waited
+
+    async def aacquire(self, tokens: int) -> float:
+        """Async counterpart of ``acquire``; waiting does not block the event loop."""
+        with self._lock:
+            if not self._queue and self._take(tokens, _priority.get()) <= 0:
+                return 0.0
+        started = time.monotonic()
+        with span("llm.queue", priority=_priority.get(), tokens=tokens) as queue:
+            with self._lock:
+                ticket = self._enqueue()
+            try:
+                while True:
+                    with self._lock:
+                        wait = self._try(ticket, tokens)
+                    if wait is not None and wait <= 0:
+                        break
+                    await asyncio.sleep(_POLL_SECONDS if wait is None else min(wait, 1.0))
+            finally:
+                with self._lock:
+                    self._dequeue(ticket)
+            waited = time.monotonic() - started
+            queue.set(waited_ms=round(waited * 1000.0, 1))
+        return waited
+
+    # Corrections
+
+    def adjust(self, tokens: float) -> None:
+        """Take ``tokens`` more from the token bucket, or give them back when negative, e.g. once actual usage is known."""
+        if not tokens or self.tokens_per_minute <= 0:
+            return
+        with self._lock:
+            self._update(lambda requests, available, now, paused_until:
+                         ((requests, min(self.tokens_per_minute, available - tokens), now, paused_until), None))
+            self._turn.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call for ``seconds``, e.g. after the API answered 429."""
+        with self._lock:
+            self._update(lambda requests, available, now, paused_until:
+                         ((requests, available, now, max(paused_until, now + seconds)), None))
+
+    def snapshot(self) -> dict:
+        """Current bucket levels, for display."""
+        with self._lock:
+            requests, tokens, _, paused_until = self._update(lambda *state: (None, state))
+            return {"requests": requests, "tokens": tokens, "queued": len(self._queue),
+                    "paused_for": max(0.0, paused_until - time.time())}
+
+    # Calls
+
+    def _settle(self, usage: Optional[dict], estimate: int) -> None:
+        if usage is not None:
+            self.adjust(usage["prompt_tokens"] + usage["completion_tokens"] - estimate)
+
+    def _failed(self, error: Exception, estimate: int) -> None:
+        # A failed request used no tokens
+        self.adjust(-estimate)
+        if is_rate_limited(error):
+            self.pause(retry_after_seconds(error) or DEFAULT_PAUSE_SECONDS)
+
+    def call(self, func: Callable, tokens: int, stream: bool = False):
+        """Run ``func()`` once a request and ``tokens`` are available, then correct the estimate from the reported usage."""
+        self.acquire(tokens)
+        try:
+            response = func()
+        except Exception as e:
+            self._failed(e, tokens)
+            raise
+        if stream:
+            return self._settle_stream(response, tokens)
+        self._settle(usage_from_response(response), tokens)
+        return response
+
+    async def acall(self, func: Callable, tokens: int, stream: bool = False):
+        """Async counterpart of ``call``."""
+        await self.aacquire(tokens)
+        try:
+            response = await func()
+        except Exception as e:
+            self._failed(e, tokens)
+            raise
+        if stream:
+            return self._asettle_stream(response, tokens)
+        self._settle(usage_from_response(response), tokens)
+        return response
+
+    def _settle_stream(self, stream, estimate: int):
+        # Usage arrives on the final chunk
+        for chunk in stream:
+            usage = usage_from_response(chunk)
+            if usage is not None:
+                self._settle(usage, estimate)
+            yield chunk
+
+    async def _asettle_stream(self, stream, estimate: int):
+        async for chunk in stream:
+            usage = usage_from_response(chunk)
+            if usage is not None:
+                self._settle(usage, estimate)
+            yield chunk
+
+
+_limiters: Dict[str, Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str) -> Optional[RateLimiter]:
+    """The process-wide limiter for ``key`` (a "provider:model" pair), or None when no limit is configured."""
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter.from_env(key)
+        return _limiters[key]
@@ -0,0 +1,313 @@
+import io
+import logging
+import os
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+from flowchart import templates as html_templates
+from flowchart.layout import Dummy, graph_elements, is_chain, layered_layout
+from flowchart.sections import ARROW_SECTIONS
+from flowchart.tracing import span
+
+logger = logging.getLogger(__name__)
+
+def _report_error(message: str) -> None:
+    logger.error(message)
+
+def generate_professional_content(section_title: str, user_input: str) -> str:
+    """Word the user's input for an arrow chart section, using the template of the section its title refers to."""
+    section = ARROW_SECTIONS.for_title(section_title)
+    return section.content(user_input) if section is not None else str(user_input)
+
+def build_arrow_chart(business_activity: str, billing: str, place_of_supply: str, expenses: str, extra_sections=()) -> dict:
+    """Assemble the arrow chart inputs in the shape RenderHTML expects.
+
+    ``extra_sections`` are further (title, content) pairs, drawn after the four standard ones.
+    """
+    arrow_chart = {
+        "title1": "BUSINESS",
+        "title2": "Billing System",
+        "title3": "PLACE OF SUPPLY",
+        "title4": "EXPENSES AND COST OF SALES",
+        "content1": business_activity,  # Directly using the user input for business activity
+        "content2": billing,
+        "content3": place_of_supply,  # Dynamically pass the Place of Supply content
+        "content4": expenses   # Dynamically pass the Expenses and Cost of Sales content
+    }
+    for index, (title, content) in enumerate(extra_sections, start=len(ARROW_SECTIONS) + 1):
+        arrow_chart[f"title{index}"] = title
+        arrow_chart[f"content{index}"] = content
+    return arrow_chart
+
+# Number of rendered step / arrow-chart fragments kept in memory, keyed by their content
+FRAGMENT_CACHE_SIZE = int(os.getenv("FLOWCHART_FRAGMENT_CACHE_SIZE", "16384"))
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def render_step_fragment(title: str, description: str, templates: html_templates.TemplateSet = html_templates.INLINE) -> str:
+    """Render one flow chart step; repeated steps are served from the fragment cache."""
+    return templates.flow_chart_step.render(title=title, description=description.replace('*', ''))
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def render_arrow_row_fragment(title: str, content: str, templates: html_templates.TemplateSet = html_templates.INLINE) -> str:
+    """Render one arrow chart row; repeated rows are served from the fragment cache."""
+    return templates.arrow_chart_row.render(title=title, content=content.replace(',', '<br>'))
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def render_graph_node_fragment(title: str, description: str, branches: str, decision: bool = False,
+                               templates: html_templates.TemplateSet = html_templates.INLINE) -> str:
+    """Render one node of a branching flow chart, with the list of where its edges lead."""
+    template = templates.decision_step if decision else templates.graph_step
+    return template.render(title=title, description=description.replace('*', ''), branches=branches)
+
+def clear_fragment_cache() -> None:
+    render_step_fragment.cache_clear()
+    render_arrow_row_fragment.cache_clear()
+    render_graph_node_fragment.cache_clear()
+
+# Heading of the flow chart when a document has a single process
+DEFAULT_PROCESS_TITLE = "Procurement Process"
+
+NO_STEPS_HTML = "<p>No flow chart steps available.</p>"
+
+class RenderHTML:
+    def __init__(self, name, description, flow_chart_steps, arrow_chart, business_activity, on_error=_report_error,
+                 compact=False, minify=False, processes=None, graph=None):
+        self.name = name
+        self.description = description  # New field for company description
+        self.flow_chart_steps = flow_chart_steps if flow_chart_steps else []  # Ensure flow_chart_steps is a list
+        # Several processes as {"title": ..., "steps": [...]} dicts, each drawn as its own section;
+        # without them the document has one "Procurement Process" section of flow_chart_steps
+        self.processes = processes
+        # A FlowChartGraph (or its dict form) drawn instead of flow_chart_steps when it branches or loops;
+        # processes take one under their "graph" key
+        self.graph = graph
+        self.arrow_chart = arrow_chart
+        self.business_activity = business_activity  # The input business activity is directly passed
+        self.on_error = on_error
+        # Compact mode shares one stylesheet instead of repeating inline styles on every element
+        self.compact = compact
+        self.minify = minify
+        self.templates = html_templates.get_templates(compact, minify)
+
+    def _arrow_sections(self):
+        # (title, content) of every section in order, worded by the registered section for its position or title
+        for index in range(1, ARROW_SECTIONS.count(self.arrow_chart) + 1):
+            section = ARROW_SECTIONS.at(index)
+            if section is not None:
+                title = self.arrow_chart.get(f'title{index}', section.title)
+                user_input = getattr(self, section.field) if section.field else self.arrow_chart.get(f'content{index}')
+            else:
+                title = self.arrow_chart.get(f'title{index}') or ''
+                user_input = self.arrow_chart.get(f'content{index}') or ''
+                section = ARROW_SECTIONS.for_title(title)
+            yield title.title().strip(), section.content(user_input) if section is not None else str(user_input)
+
+    def improve_arrow_chart_content(self):
+        """Modify and improve the arrow chart content based on user inputs, as titleN/contentN for every section."""
+        improved = {}
+        for index, (title, content) in enumerate(self._arrow_sections(), start=1):
+            improved[f'title{index}'] = title
+            improved[f'content{index}'] = content
+        return improved
+
+    def arrow_chart_rows(self):
+        """Yield the (title, content) of each arrow chart row that has something to show."""
+        for title, content in self._arrow_sections():
+            content = content.strip()
+            if title or content:  # Only render if there's valid content
+                yield title, content
+
+    def iter_arrow_chart(self):
+        """Yield the HTML of each arrow chart row."""
+        for title, content in self.arrow_chart_rows():
+            yield render_arrow_row_fragment(title, content, self.templates)
+
+    def generate_arrow_chart(self):
+        """Generate the improved arrow chart HTML."""
+        return "".join(self.iter_arrow_chart())
+
+    @staticmethod
+    def format_description(description):
+        if isinstance(description, str):
+            return description.replace('*', '')
+        return str(description).replace('*', '').replace('[', '').replace(']', '')
+
+    def sections(self):
+        """The (title, steps, graph) of each flow chart section, in document order.
+
+        ``graph`` is None unless the section has a graph that branches or loops; a graph
+        that is a plain chain becomes its steps, so it renders exactly like a step list.
+        ``steps`` always lists every step, in node order for a graph.
+        """
+        if not self.processes:
+            return [self._section(DEFAULT_PROCESS_TITLE, self.flow_chart_steps, self.graph)]
+        return [self._section(process.get("title") or DEFAULT_PROCESS_TITLE, process.get("steps") or [], process.get("graph"))
+                for process in self.processes]
+
+    @staticmethod
+    def _section(title, steps, graph):
+        if graph is None:
+            return title, steps, None
+        nodes, edges = graph_elements(graph)
+        steps = [{"title": node["title"], "description": node["description"]} for node in nodes]
+        return title, steps, None if is_chain(nodes, edges) else (nodes, edges)
+
+    def iter_flow_chart(self, steps=None):
+        """Yield the HTML fragments of the flow chart: each step, separated by a connector arrow.
+
+        Step fragments are memoized by content, so after editing one step only that
+        step is rendered again and the document is reassembled from cached fragments.
+        """
+        for index, step in enumerate(self.flow_chart_steps if steps is None else steps):
+            if index != 0:
+                yield self.templates.step_connector
+            description = step['description']
+            if not isinstance(description, str):
+                description = self.format_description(description)
+            yield render_step_fragment(str(step['title']), description, self.templates)
+
+    def iter_graph_flow_chart(self, graph):
+        """Yield the HTML fragments of a branching flow chart, one row per layer of its layered layout.
+
+        ``graph`` is a (nodes, edges) pair as from ``flowchart.layout.graph_elements``.
+        """
+        nodes, edges = graph
+        by_id = {node["id"]: node for node in nodes}
+        with span("layout", nodes=len(nodes), edges=len(edges)) as layout_span:
+            layout = layered_layout(list(by_id), [(source, target) for source, target, _ in edges])
+            layout_span.set(layers=len(layout.layers), crossings=layout.crossings)
+
+        outgoing = defaultdict(list)
+        for index, (source, target, label) in enumerate(edges):
+            outgoing[source].append((index, target, label))
+        for layer_index, layer in enumerate(layout.layers):
+            if layer_index != 0:
+                yield self.templates.step_connector
+            yield from self.templates.graph_layer.iter(nodes=self._iter_graph_layer(layer, by_id, outgoing, layout))
+
+    def _iter_graph_layer(self, layer, by_id, outgoing, layout):
+        templates = self.templates
+        for node_id in layer:
+            if isinstance(node_id, Dummy):
+                yield templates.graph_edge
+                continue
+            node = by_id[node_id]
+            description = node["description"]
+            if not isinstance(description, str):
+                description = self.format_description(description)
+            branches = outgoing[node_id]
+            # A single unlabelled edge to the next layer is clear from the layout alone
+            if len(branches) == 1 and not branches[0][2] and branches[0][0] not in layout.reversed_edges \
+                    and len(layout.routes[branches[0][0]]) == 2:
+                branches = ()
+            branches_html = "".join(
+                templates.graph_branch.render(arrow="&#8634;" if index in layout.reversed_edges else "&#8594;",
+                                              label=f"{label}: " if label else "", target=str(by_id[target]["title"]))
+                for index, target, label in branches)
+            yield render_graph_node_fragment(str(node["title"]), description, branches_html, node["kind"] == "decision", templates)
+
+    def generate_flow_chart(self, steps=None, graph=None):
+        """Generate the flow chart HTML content."""
+        steps = self.flow_chart_steps if steps is None else steps
+        if not steps:
+            return NO_STEPS_HTML
+
+        try:
+            return "".join(self.iter_flow_chart(steps) if graph is None else self.iter_graph_flow_chart(graph))
+        except Exception as e:
+            self.on_error(f"Error generating flow chart: {str(e)}")
+            return "<p>Error generating flow chart content.</p>"
+
+    def pdf_script(self):
+        """Return the html2pdf.js script used by the in-browser download button, or "" when it is unavailable."""
+        return html_templates.get_pdf_script()
+
+    def write_html(self, fp, for_pdf=False):
+        """Render the complete document straight into the file-like object ``fp``.
+
+        Steps are written as they are rendered, so the whole document never has to
+        be held in memory as one string.
+        """
+        sections = self.sections()
+        flow_charts = [(title, self._guarded_flow_chart(steps, graph) if steps else NO_STEPS_HTML) for title, steps, graph in sections]
+        # The flow charts are rendered while the document is written, so they have no spans of their own here
+        with span("render.document", sections=len(sections), steps=sum(len(steps) for _, steps, _ in sections),
+                  for_pdf=for_pdf, streamed=True):
+            self._write_document(fp.write, flow_charts, for_pdf)
+
+    def _guarded_flow_chart(self, steps, graph=None):
+        try:
+            yield from self.iter_flow_chart(steps) if graph is None else self.iter_graph_flow_chart(graph)
+        except Exception as e:
+            self.on_error(f"Error generating flow chart: {str(e)}")
+            yield "<p>Error generating flow chart content.</p>"
+
+    def _iter_sections(self, flow_charts):
+        for index, (title, flow_chart) in enumerate(flow_charts):
+            section_id = "flow-chart" if index == 0 else f"flow-chart-{index + 1}"
+            yield from self.templates.flow_chart_section.iter(section_id=section_id, title=title, flow_chart=flow_chart)
+
+    def _write_document(self, write, flow_charts, for_pdf):
+        with span("render.arrow_chart") as arrow_chart_span:
+            arrow_chart_html = self.generate_arrow_chart()
+            arrow_chart_span.set(chars=len(arrow_chart_html))
+        pdf_script = "" if for_pdf else self.pdf_script()
+        self.templates.document.write(
+            write,
+            pdf_script=pdf_script,
+            name=self.name,
+            date=date.today().strftime("%d/%m/%Y"),
+            description=self.description,
+            arrow_chart=self.templates.arrow_chart_section.render(arrow_chart=arrow_chart_html) if arrow_chart_html else "",
+            flow_charts=self._iter_sections(flow_charts),
+            # No button without the script, e.g. when the vendored copy is missing
+            download_button=html_templates.DOWNLOAD_BUTTON if pdf_script else "",
+        )
+
+    def generate_html(self, for_pdf=False):
+        """Generate the complete HTML output including flow chart and arrow chart.
+
+        With ``for_pdf`` the in-browser html2pdf script and download button are left out,
+        since the document is converted on the server instead.
+        """
+        sections = self.sections()
+        with span("render.html", sections=len(sections), for_pdf=for_pdf) as html_span:
+            flow_charts = []
+            for title, steps, graph in sections:
+                with span("render.flow_chart", title=title, steps=len(steps), branching=graph is not None) as flow_chart_span:
+                    flow_chart = self.generate_flow_chart(steps, graph)
+                    flow_chart_span.set(chars=len(flow_chart))
+                flow_charts.append((title, flow_chart))
+            pieces = []
+            with span("render.document"):
+                self._write_document(pieces.append, flow_charts, for_pdf)
+            html = "".join(pieces)
+            if html_span.recording:
+                html_span.set(bytes=len(html.encode("utf-8")))
+        return html
+
+    def write_export(self, fp, fmt):
+        """Write the flow chart sections and arrow chart to ``fp`` as Mermaid, Graphviz DOT or SVG."""
+        from flowchart.export import write_export
+
+        sections = self.sections()
+        with span("render.export", format=fmt, sections=len(sections)):
+            write_export(fp, fmt, sections, self.arrow_chart_rows())
+
+    def generate_export(self, fmt):
+        buffer = io.StringIO()
+        self.write_export(buffer, fmt)
+        return buffer.getvalue()
+
+    def size_report(self, for_pdf=False):
+        """Compare the document size in this output mode against the default inline-styled output."""
+        inline_generator = RenderHTML(self.name, self.description, self.flow_chart_steps, self.arrow_chart,
+                                      self.business_activity, on_error=self.on_error, processes=self.processes, graph=self.graph)
+        inline_bytes = len(inline_generator.generate_html(for_pdf).encode("utf-8"))
+        output_bytes = len(self.generate_html(for_pdf).encode("utf-8"))
+        return {
+            "inline_bytes": inline_bytes,
+            "output_bytes": output_bytes,
+            "saved_bytes": inline_bytes - output_bytes,
+            "saved_percent": 100.0 * (inline_bytes - output_bytes) / inline_bytes if inline_bytes else 0.0,
+        }
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from flowchart.tracing import bind_context
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Exception class names the groq/openai/httpx clients raise for transient network failures
+_TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+                     "ReadError", "WriteError", "RemoteProtocolError", "PoolTimeout"}
+
+
+class RetryPolicy:
+    """How many times to retry a transient LLM failure and how long to wait in between.
+
+    Waits use full-jitter exponential backoff (a random delay up to
+    ``base_delay * 2 ** attempt``, capped at ``max_delay``). A Retry-After header
+    on the error takes precedence; if it asks for more than ``max_delay`` the
+    error is raised instead of blocking the caller that long.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.getenv("FLOWCHART_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("FLOWCHART_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("FLOWCHART_RETRY_MAX_DELAY", "30")),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def delay_for(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if ``error`` should not be retried."""
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+        retry_after = retry_after_seconds(error)
+        if retry_after is None:
+            return self.backoff(attempt)
+        return retry_after if retry_after <= self.max_delay else None
+
+
+class HedgePolicy:
+    """Send a duplicate request if the first has not answered after ``after`` seconds.
+
+    The duplicate goes to ``provider`` (for example a faster model) or, if that is
+    None, to the same provider as the original request.
+    """
+
+    def __init__(self, after: float, provider=None):
+        self.after = after
+        self.provider = provider
+
+    @classmethod
+    def from_env(cls):
+        after = float(os.getenv("FLOWCHART_HEDGE_AFTER", "0"))
+        if after <= 0:
+            return None
+        spec = os.getenv("FLOWCHART_HEDGE_PROVIDER")
+        if spec:
+            from flowchart.providers import load_providers
+
+            return cls(after, load_providers(spec))
+        return cls(after)
+
+    async def aclose(self):
+        """Close the async client of the hedge ``provider``, if it has its own."""
+        if self.provider is not None:
+            await self.provider.aclose()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limiting, server errors and network failures; False for bad requests and auth errors."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__) or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After (or retry-after-ms) header from an HTTP error, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retries(func: Callable, policy: RetryPolicy, description: str = "LLM request"):
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            delay = policy.delay_for(e, attempt)
+            if delay is None:
+                raise
+            logger.warning("%s failed (%s), retrying in %.2fs (attempt %d of %d)", description, e, delay, attempt + 2, policy.max_attempts)
+            time.sleep(delay)
+            attempt += 1
+
+
+async def acall_with_retries(func: Callable, policy: RetryPolicy, description: str = "LLM request"):
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except Exception as e:
+            delay = policy.delay_for(e, attempt)
+            if delay is None:
+                raise
+            logger.warning("%s failed (%s), retrying in %.2fs (attempt %d of %d)", description, e, delay, attempt + 2, policy.max_attempts)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FLOWCHART_HEDGE_WORKERS", "32")), thread_name_prefix="llm-hedge")
+        return _hedge_pool
+
+
+def hedged_call(func: Callable, provider, hedge: Optional[HedgePolicy]):
+    """Call ``func(provider)``; if it is still running after ``hedge.after`` seconds, also call it on the
+    hedge provider and return whichever succeeds first. ``func`` should raise on an invalid answer.
+    """
+    if hedge is None:
+        return func(provider)
+
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pool = _get_hedge_pool()
+    # Bound to the caller's context so spans opened on the pool threads join the caller's trace
+    pending = {pool.submit(bind_context(func), provider)}
+    done, pending = wait(pending, timeout=hedge.after)
+    if not done:
+        logger.info("No answer after %.2fs, sending a hedged request", hedge.after)
+        pending.add(pool.submit(bind_context(func), hedge.provider or provider))
+
+    last_error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()  # The slower request finishes in the background and is ignored
+            last_error = future.exception()
+        if not pending:
+            raise last_error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+async def ahedged_call(func: Callable, provider, hedge: Optional[HedgePolicy]):
+    """Async counterpart of hedged_call; the losing request is cancelled."""
+    if hedge is None:
+        return await func(provider)
+
+    pending = {asyncio.ensure_future(func(provider))}
+    done, pending = await asyncio.wait(pending, timeout=hedge.after)
+    if not done:
+        logger.info("No answer after %.2fs, sending a hedged request", hedge.after)
+        pending.add(asyncio.ensure_future(func(hedge.provider or provider)))
+
+    last_error = None
+    try:
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+            if not pending:
+                raise last_error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,115 @@
+"""Arrow chart sections: what each one is called by default and how the user's input is worded in it.
+
+A chart is a dict of ``titleN`` / ``contentN`` pairs numbered from 1, with any
+number of sections. The registered sections are the first ones in order; each
+has a compiled template, so the wording costs one pass over precomputed
+pieces. Sections numbered past the registered ones are matched on their
+title, which is looked up in a table built once per distinct title.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+from flowchart.templates import CompiledTemplate
+
+_SECTION_KEY = re.compile(r"^(?:title|content)(\d+)$")
+
+# Distinct titles remembered by SectionRegistry.for_title before the table is started again
+MAX_TITLES = 4096
+
+
+class ArrowSection:
+    """One kind of arrow chart section.
+
+    ``template`` words the user's input, given as ``${input}``. ``keywords``
+    match other titles to this section ("Billing and Collections" to billing).
+    ``field`` names the RenderHTML attribute holding the input when it is not
+    the chart's ``contentN``.
+    """
+
+    __slots__ = ("key", "title", "template", "keywords", "field")
+
+    def __init__(self, key: str, title: str, template: str = "${input}", keywords: Iterable[str] = (), field: Optional[str] = None):
+        self.key = key
+        self.title = title
+        self.template = CompiledTemplate(template)
+        self.keywords = tuple(keyword.casefold() for keyword in keywords)
+        self.field = field
+
+    def __repr__(self):
+        return f"ArrowSection({self.key!r})"
+
+    def content(self, user_input) -> str:
+        return self.template.render(input=str(user_input))
+
+
+class SectionRegistry:
+    """The arrow chart sections in chart order, looked up by position, key or title."""
+
+    def __init__(self, sections: Iterable[ArrowSection] = ()):
+        self._sections: List[ArrowSection] = []
+        self._by_key: Dict[str, ArrowSection] = {}
+        self._by_title: Dict[str, Optional[ArrowSection]] = {}
+        for section in sections:
+            self.register(section)
+
+    def register(self, section: ArrowSection) -> ArrowSection:
+        """Add a section after the registered ones, or replace the one with the same key in place."""
+        if section.key in self._by_key:
+            self._sections[self._sections.index(self._by_key[section.key])] = section
+        else:
+            self._sections.append(section)
+        self._by_key[section.key] = section
+        self._by_title.clear()
+        return section
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def __iter__(self) -> Iterator[ArrowSection]:
+        return iter(self._sections)
+
+    def get(self, key: str) -> Optional[ArrowSection]:
+        return self._by_key.get(key)
+
+    def at(self, index: int) -> Optional[ArrowSection]:
+        """The section registered at chart position ``index`` (from 1), or None past the last one."""
+        return self._sections[index - 1] if 0 < index <= len(self._sections) else None
+
+    def for_title(self, title: str) -> Optional[ArrowSection]:
+        """The section a heading refers to: the first with that default title or a keyword the heading contains."""
+        try:
+            return self._by_title[title]
+        except KeyError:
+            pass
+        folded = " ".join((title or "").split()).casefold()
+        match = None
+        for section in self._sections:
+            if folded == section.title.casefold() or any(keyword in folded for keyword in section.keywords):
+                match = section
+                break
+        if len(self._by_title) >= MAX_TITLES:
+            self._by_title.clear()
+        self._by_title[title] = match
+        return match
+
+    def count(self, arrow_chart: dict) -> int:
+        """Sections in a chart: the registered ones, plus any numbered past them."""
+        highest = len(self._sections)
+        for key in arrow_chart:
+            match = _SECTION_KEY.match(key) if isinstance(key, str) else None
+            if match:
+                highest = max(highest, int(match.group(1)))
+        return highest
+
+
+ARROW_SECTIONS = SectionRegistry([
+    ArrowSection("business_activity", "Business Activity", field="business_activity"),
+    ArrowSection("billing", "Billing System",
+                 "The company has implemented a robust billing system. ${input} This ensures a streamlined invoicing process with multiple payment gateways available to customers.",
+                 keywords=["billing"]),
+    ArrowSection("place_of_supply", "Place Of Supply",
+                 "The primary place of supply is ${input}, which ensures compliance with the relevant regional tax laws and regulations.",
+                 keywords=["place of supply"]),
+    ArrowSection("expenses", "Expenses And Cost Of Sales",
+                 "The company manages expenses like ${input}, ensuring that the cost of sales is minimized while maximizing profitability.",
+                 keywords=["expenses and cost of sales"]),
+])
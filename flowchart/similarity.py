@@ -0,0 +1,105 @@
+"""Near-duplicate detection for step explanations: word shingles, MinHash signatures and LSH banding.
+
+An explanation becomes the set of its overlapping word triples ("shingles").
+Two explanations are as similar as the Jaccard index of their shingle sets.
+A MinHash signature approximates that set in NUM_PERM numbers. Banding the
+signature (locality-sensitive hashing) finds the explanations likely to be
+similar without comparing against every stored one. The few candidates are
+then scored exactly.
+"""
+import hashlib
+import re
+from array import array
+from collections import defaultdict
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Set, Tuple
+
+SHINGLE_WORDS = 3
+# 16 bands of 4 rows: pairs at Jaccard 0.5 are found with probability ~0.65, at 0.7 ~0.98
+NUM_PERM = 64
+BANDS = 16
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+
+
+def _permutations(count: int, seed: int = 1) -> List[Tuple[int, int]]:
+    # Fixed coefficients, so signatures written by one process are comparable in the next
+    permutations = []
+    for index in range(count):
+        digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=16).digest()
+        permutations.append((int.from_bytes(digest[:8], "little") % (_PRIME - 1) + 1, int.from_bytes(digest[8:], "little") % _PRIME))
+    return permutations
+
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+
+def shingles(text: str, words: int = SHINGLE_WORDS) -> FrozenSet[str]:
+    """The set of overlapping ``words``-word sequences in ``text``, ignoring case, spacing and punctuation."""
+    tokens = _WORD.findall((text or "").lower())
+    if len(tokens) <= words:
+        return frozenset([" ".join(tokens)]) if tokens else frozenset()
+    return frozenset(" ".join(tokens[index:index + words]) for index in range(len(tokens) - words + 1))
+
+
+def jaccard(a: Set, b: Set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(shingle_set: Iterable[str]) -> array:
+    """The MinHash signature of a shingle set, as NUM_PERM unsigned 32-bit values."""
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingle_set]
+    if not hashes:
+        return array("I", [_MASK] * NUM_PERM)
+    return array("I", [min((a * value + b) % _PRIME for value in hashes) & _MASK for a, b in _PERMUTATIONS])
+
+
+def band_keys(signature: array) -> List[Tuple]:
+    rows = len(signature) // BANDS
+    return [(band,) + tuple(signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+
+class LSHIndex:
+    """In-memory LSH buckets mapping signature bands to the keys that share them.
+
+    Keys are grouped by ``scope`` (e.g. model and prompt), since answers are only
+    interchangeable within one.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple, Set[Hashable]] = defaultdict(set)
+        self._keys: Dict[Hashable, List[Tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, signature: array, scope: str = "") -> None:
+        self.remove(key)
+        buckets = [(scope,) + band for band in band_keys(signature)]
+        for bucket in buckets:
+            self._buckets[bucket].add(key)
+        self._keys[key] = buckets
+
+    def remove(self, key: Hashable) -> None:
+        """Drop ``key`` from its buckets, and any bucket left empty; unknown keys are ignored."""
+        for bucket in self._keys.pop(key, ()):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def candidates(self, signature: array, scope: str = "", limit: int = 20) -> List[Hashable]:
+        """Keys sharing at least one band with ``signature``, those sharing the most bands first."""
+        counts = defaultdict(int)
+        for band in band_keys(signature):
+            for key in self._buckets.get((scope,) + band, ()):
+                counts[key] += 1
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._keys.clear()
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Handed to waiting callers when the call they joined was abandoned (e.g. its task was cancelled);
+# they then try again, and one of them makes the call itself
+_RETRY = object()
+
+
+class SingleFlight:
+    """Process-wide registry of calls in flight, so concurrent callers with the same key share one call.
+
+    The first caller for a key makes the call; callers arriving while it runs wait
+    for its result (or exception) instead of making their own. Threads and asyncio
+    tasks on any event loop can share a call, since the result is published on a
+    ``concurrent.futures.Future``. Nothing is kept once the call finishes; caching
+    results is the response cache's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def lead_or_wait(self, key: Hashable) -> Tuple[Optional[Future], object]:
+        """Return ``(future, None)`` if the caller must make the call and then ``release`` the future,
+        or ``(None, result)`` once the identical call already in flight has finished.
+
+        Raises the exception the call in flight raised.
+        """
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                return future, None
+            result = future.result()
+            if result is not _RETRY:
+                return None, result
+
+    async def alead_or_wait(self, key: Hashable) -> Tuple[Optional[Future], object]:
+        """Async counterpart of ``lead_or_wait``; waiting does not block the event loop."""
+        while True:
+            future, leader = self._claim(key)
+            if leader:
+                return future, None
+            # Shielded, so a cancelled waiter does not cancel the shared call
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _RETRY:
+                return None, result
+
+    def release(self, key: Hashable, future: Future, result=_RETRY, error: Optional[BaseException] = None) -> None:
+        """Publish the result (or error) of a call to everyone waiting on it.
+
+        Releasing with neither, e.g. when the call was abandoned, makes the waiters try again.
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key: Hashable, func: Callable):
+        """Call ``func()``, or wait for the identical call already in flight. Returns ``(result, shared)``."""
+        future, result = self.lead_or_wait(key)
+        if future is None:
+            return result, True
+        try:
+            result = func()
+        except Exception as e:
+            self.release(key, future, error=e)
+            raise
+        except BaseException:
+            self.release(key, future)
+            raise
+        self.release(key, future, result)
+        return result, False
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable]):
+        """Async counterpart of ``do``."""
+        future, result = await self.alead_or_wait(key)
+        if future is None:
+            return result, True
+        try:
+            result = await func()
+        except Exception as e:
+            self.release(key, future, error=e)
+            raise
+        except BaseException:
+            self.release(key, future)
+            raise
+        self.release(key, future, result)
+        return result, False
+
+
+# Shared by every Streamlit session and batch task in the process
+inflight = SingleFlight()
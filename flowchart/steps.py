@@ -0,0 +1,82 @@
+import itertools
+from typing import Iterable, List, Optional
+
+# Every table gets a new version, so a grid widget keyed on it starts fresh when the steps are regenerated
+_versions = itertools.count(1)
+
+
+def _text(value) -> str:
+    return "" if value is None else str(value)
+
+
+class StepTable:
+    """Flow chart steps as rows with stable IDs, edited by applying batched diffs.
+
+    The diff format is the one ``st.data_editor`` keeps in session state:
+    ``{"edited_rows": {position: {column: value}}, "added_rows": [{column: value}],
+    "deleted_rows": [position]}``, with positions counted in this table's rows.
+    Applying it returns a new table and leaves this one untouched, so the same
+    base table can be shown to the grid on every rerun.
+    """
+
+    def __init__(self, rows: Optional[List[dict]] = None, next_id: int = 1, version: Optional[int] = None):
+        self._rows = rows or []
+        self.next_id = next_id
+        self.version = next(_versions) if version is None else version
+
+    @classmethod
+    def from_steps(cls, steps: Iterable[dict]) -> "StepTable":
+        rows = [{"id": row_id, "title": _text(step.get("title")), "description": _text(step.get("description"))}
+                for row_id, step in enumerate(steps, start=1)]
+        return cls(rows, next_id=len(rows) + 1)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def rows(self) -> List[dict]:
+        """The rows as shown in the grid, numbered from 1 in display order."""
+        return [{"id": row["id"], "step": position, "title": row["title"], "description": row["description"]}
+                for position, row in enumerate(self._rows, start=1)]
+
+    def to_steps(self) -> List[dict]:
+        return [{"title": row["title"], "description": row["description"]} for row in self._rows]
+
+    def apply_changes(self, changes: Optional[dict]) -> "StepTable":
+        """Return a new table with the edits, inserts and deletes in ``changes`` applied in one pass.
+
+        Changing a row's step number moves it; a new row numbered 2.5 lands between
+        steps 2 and 3. Rows without a number keep their place, and new ones go last.
+        """
+        if not changes:
+            return self
+        edited = {int(position): values for position, values in (changes.get("edited_rows") or {}).items()}
+        deleted = {int(position) for position in changes.get("deleted_rows") or ()}
+        added = changes.get("added_rows") or ()
+        if not (edited or deleted or added):
+            return self
+
+        placed = []  # (step number, original order, row)
+        reordered = False
+        for position, row in enumerate(self._rows):
+            if position in deleted:
+                continue
+            values = edited.get(position)
+            step_number = position + 1
+            if values:
+                row = dict(row, **{column: _text(values[column]) for column in ("title", "description") if column in values})
+                if values.get("step") is not None:
+                    step_number = float(values["step"])
+                    reordered = True
+            placed.append((step_number, len(placed), row))
+
+        next_id = self.next_id
+        for values in added:
+            step_number = values.get("step")
+            reordered = reordered or step_number is not None
+            row = {"id": next_id, "title": _text(values.get("title")), "description": _text(values.get("description"))}
+            placed.append((float(step_number) if step_number is not None else float("inf"), len(placed), row))
+            next_id += 1
+
+        if reordered:
+            placed.sort(key=lambda entry: entry[:2])
+        return StepTable([row for _, _, row in placed], next_id=next_id, version=self.version)
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Union
+from flowchart.cache import normalize_explanation
+
+# Reports are kept until deleted, so they live with user data rather than in the cache directory
+DEFAULT_STORE_PATH = os.getenv("FLOWCHART_STORE_PATH", os.path.join(os.path.expanduser("~"), ".local", "share", "flowchart", "reports.sqlite3"))
+
+
+def company_key(name: str) -> str:
+    """Collapse whitespace and case so "ACME  Ltd" and "acme ltd" list as the same company."""
+    return " ".join((name or "").split()).casefold()
+
+
+def make_input_hash(name: str, description: str, business_activity: str, arrow_chart: dict, processes: Sequence[dict]) -> str:
+    """Hash everything the user typed in for a report, so the same inputs find the same stored report.
+
+    Explanations are normalized like response cache keys; generated steps are not part of the hash.
+    """
+    payload = json.dumps([
+        company_key(name), " ".join((description or "").split()), " ".join((business_activity or "").split()),
+        {key: value for key, value in sorted((arrow_chart or {}).items())},
+        [[process.get("title") or "", normalize_explanation(process.get("explanation") or "")] for process in processes],
+    ], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _plain(value):
+    # FlowChartStep / FlowChartGraph models are stored as the dicts they dump to
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StoredReport:
+    """A saved report: the company inputs, each process's generated steps, and which artifacts are stored with it."""
+
+    def __init__(self, report_id: int, company: str, input_hash: str, created: float, description: str, business_activity: str,
+                 arrow_chart: dict, processes: List[dict], artifacts: Sequence[str] = ()):
+        self.report_id = report_id
+        self.company = company
+        self.input_hash = input_hash
+        self.created = created
+        self.description = description
+        self.business_activity = business_activity
+        self.arrow_chart = arrow_chart
+        self.processes = processes  # [{"title", "explanation", "steps"[, "graph"]}], the procurement process first
+        self.artifacts = list(artifacts)
+
+    @property
+    def flow_chart_steps(self) -> List[dict]:
+        return self.processes[0]["steps"] if self.processes else []
+
+    def html_generator(self, **options):
+        """A RenderHTML for this report, so it can be rendered again in any mode without calling the LLM."""
+        from flowchart.render import RenderHTML
+
+        return RenderHTML(self.company, self.description, self.flow_chart_steps, self.arrow_chart, self.business_activity,
+                          processes=self.processes if len(self.processes) > 1 else None, **options)
+
+
+class ReportStore:
+    """SQLite store of generated reports, shared by every Streamlit session and the batch CLI.
+
+    Reports are indexed by company, input hash and day, so a company's history,
+    an earlier report for identical inputs, or a day's output can be looked up
+    without scanning. Rendered artifacts (HTML, PDF, exports) are kept in a
+    separate table and only read when asked for.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            " id INTEGER PRIMARY KEY,"
+            " company TEXT NOT NULL,"
+            " company_key TEXT NOT NULL,"
+            " input_hash TEXT NOT NULL,"
+            " day TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " description TEXT NOT NULL,"
+            " business_activity TEXT NOT NULL,"
+            " arrow_chart TEXT NOT NULL,"
+            " processes TEXT NOT NULL,"
+            " process_count INTEGER NOT NULL,"
+            " step_count INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_company ON reports (company_key, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_input ON reports (input_hash, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_day ON reports (day)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,"
+            " kind TEXT NOT NULL,"
+            " data BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (report_id, kind))"
+        )
+
+    def save(self, name: str, description: str, business_activity: str, arrow_chart: dict, processes: Sequence[dict],
+             artifacts: Optional[Dict[str, Union[str, bytes]]] = None, report_id: Optional[int] = None) -> int:
+        """Store a report and return its id.
+
+        ``processes`` are ``{"title", "explanation", "steps"}`` dicts with the
+        procurement process first. Passing the ``report_id`` of an earlier save
+        replaces that report (e.g. after its steps were edited) and keeps its
+        artifacts unless new ones of the same kind are given.
+        """
+        processes = [dict(process) for process in processes]
+        input_hash = make_input_hash(name, description, business_activity, arrow_chart, processes)
+        processes_json = json.dumps(processes, default=_plain)
+        step_count = sum(len(process.get("steps") or ()) for process in processes)
+        now = time.time()
+        values = (name or "", company_key(name), input_hash, time.strftime("%Y-%m-%d", time.localtime(now)), now, description or "",
+                  business_activity or "", json.dumps(arrow_chart or {}), processes_json, len(processes), step_count)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if report_id is None or self._conn.execute("SELECT 1 FROM reports WHERE id = ?", (report_id,)).fetchone() is None:
+                    report_id = self._conn.execute(
+                        "INSERT INTO reports (company, company_key, input_hash, day, created, description, business_activity,"
+                        " arrow_chart, processes, process_count, step_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values).lastrowid
+                else:
+                    self._conn.execute(
+                        "UPDATE reports SET company = ?, company_key = ?, input_hash = ?, day = ?, created = ?, description = ?,"
+                        " business_activity = ?, arrow_chart = ?, processes = ?, process_count = ?, step_count = ? WHERE id = ?", values + (report_id,))
+                self._put_artifacts(report_id, artifacts or {}, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return report_id
+
+    def save_artifacts(self, report_id: int, artifacts: Dict[str, Union[str, bytes]]) -> None:
+        """Attach rendered output to a report, e.g. ``{"html": ..., "pdf": pdf_bytes}``; a kind stored before is replaced."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._put_artifacts(report_id, artifacts, time.time())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _put_artifacts(self, report_id: int, artifacts: Dict[str, Union[str, bytes]], now: float) -> None:
+        rows = []
+        for kind, data in artifacts.items():
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            rows.append((report_id, kind, data, len(data), now))
+        self._conn.executemany("INSERT OR REPLACE INTO artifacts (report_id, kind, data, size, created) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get(self, report_id: int) -> Optional[StoredReport]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, company, input_hash, created, description, business_activity, arrow_chart, processes"
+                " FROM reports WHERE id = ?", (report_id,)).fetchone()
+            if row is None:
+                return None
+            kinds = [kind for kind, in self._conn.execute("SELECT kind FROM artifacts WHERE report_id = ? ORDER BY kind", (report_id,))]
+        report_id, company, input_hash, created, description, business_activity, arrow_chart, processes = row
+        return StoredReport(report_id, company, input_hash, created, description, business_activity, json.loads(arrow_chart),
+                            json.loads(processes), kinds)
+
+    def find(self, input_hash: str) -> Optional[StoredReport]:
+        """The most recent report generated from the inputs with this hash, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM reports WHERE input_hash = ? ORDER BY created DESC LIMIT 1", (input_hash,)).fetchone()
+        return None if row is None else self.get(row[0])
+
+    def artifact(self, report_id: int, kind: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM artifacts WHERE report_id = ? AND kind = ?", (report_id, kind)).fetchone()
+        return None if row is None else row[0]
+
+    def list(self, company: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+             limit: int = 50) -> List[dict]:
+        """Summaries of stored reports, newest first, without their steps or artifacts.
+
+        ``company`` matches names starting with it (ignoring case and spacing);
+        ``since`` and ``until`` are inclusive ``YYYY-MM-DD`` days.
+        """
+        clauses, parameters = [], []
+        if company:
+            # A range on the indexed key rather than LIKE, which SQLite cannot serve from a case-insensitive index
+            key = company_key(company)
+            clauses.append("company_key >= ? AND company_key < ?")
+            parameters += [key, key + "\U0010ffff"]
+        if since:
+            clauses.append("day >= ?")
+            parameters.append(since)
+        if until:
+            clauses.append("day <= ?")
+            parameters.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, company, input_hash, day, created, step_count, process_count FROM reports"
+                f"{where} ORDER BY created DESC LIMIT ?", parameters + [limit]).fetchall()
+        return [{"id": report_id, "company": name, "input_hash": input_hash, "day": day, "created": created,
+                 "steps": step_count, "processes": process_count}
+                for report_id, name, input_hash, day, created, step_count, process_count in rows]
+
+    def delete(self, report_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+
+    def total_bytes(self) -> int:
+        """Bytes held by stored artifacts."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
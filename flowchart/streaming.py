@@ -0,0 +1,76 @@
+import json
+from typing import List
+from flowchart.parsing import is_step, parse_steps, repair_json, validate_steps
+
+
+class StepStreamParser:
+    """Incrementally pull complete step objects out of a partially received JSON document.
+
+    The model streams its answer a few characters at a time. Every time a JSON
+    object closes we try to decode it, and if it is a step by the rule
+    ``extract_steps`` uses (a ``title`` and a ``description`` and no steps nested
+    inside) it is handed back as a finished step. This works whether the steps
+    arrive wrapped (``{"steps": [...]}``, even with a title of its own), as a bare
+    list, or as a single step object. Objects with small defects such as trailing commas are repaired,
+    and every step is validated through FlowChartStep. Call ``finish`` once the
+    stream ends to recover steps from truncated or otherwise malformed output.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._object_starts = []
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume the next chunk of text and return any steps it completed."""
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._object_starts.append(i)
+            elif char == "}" and self._object_starts:
+                start = self._object_starts.pop()
+                step = self._decode_step(buffer[start:i + 1])
+                if step is not None:
+                    completed.append(step)
+        self._pos = len(buffer)
+        self.emitted += len(completed)
+        return completed
+
+    def finish(self) -> List[dict]:
+        """Parse the whole answer tolerantly and return any steps the incremental pass missed."""
+        try:
+            steps, _ = parse_steps(self.buffer)
+        except json.JSONDecodeError:
+            return []
+        remaining = steps[self.emitted:]
+        self.emitted += len(remaining)
+        return remaining
+
+    @staticmethod
+    def _decode_step(text: str):
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                obj = json.loads(repair_json(text))
+            except json.JSONDecodeError:
+                return None
+        if is_step(obj):
+            steps = validate_steps([{"title": obj["title"], "description": obj["description"]}])
+            return steps[0] if steps else None
+        return None
@@ -0,0 +1,422 @@
+import hashlib
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\{(\w+)\}")
+
+
+class CompiledTemplate:
+    """A template split once into literal text and ``${name}`` placeholders.
+
+    Rendering walks the precomputed parts instead of re-parsing or re-formatting
+    the source, and output is produced as a list of pieces joined once at the end
+    (or written piece by piece) so the cost stays linear in the output size.
+    A placeholder value may be a string or any iterable of strings, which lets
+    large sections such as the flow chart steps be streamed into the document.
+    """
+
+    __slots__ = ("source", "_literals", "_names")
+
+    def __init__(self, source: str):
+        self.source = source
+        parts = _PLACEHOLDER.split(source)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+
+    def write(self, write: Callable[[str], object], **values) -> None:
+        """Write the rendered template piece by piece through ``write`` (e.g. ``fp.write``)."""
+        literals = self._literals
+        write(literals[0])
+        for name, literal in zip(self._names, literals[1:]):
+            value = values[name]
+            if isinstance(value, str):
+                write(value)
+            else:
+                for piece in value:
+                    write(piece)
+            write(literal)
+
+    def render(self, **values) -> str:
+        pieces = []
+        self.write(pieces.append, **values)
+        return "".join(pieces)
+
+    def iter(self, **values):
+        """Yield the rendered template piece by piece, for nesting a streamed template inside another."""
+        literals = self._literals
+        yield literals[0]
+        for name, literal in zip(self._names, literals[1:]):
+            value = values[name]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield literal
+
+
+# Separator drawn between two consecutive flow chart steps
+STEP_CONNECTOR = """<div style="position: relative; text-align: center; font-size: 24px;">
+                                            <div style="width: 0; height: 0; border-left: 10px solid transparent; border-right: 10px solid transparent; border-top: 10px solid #333; margin: 10px auto;"></div>
+                                        </div>"""
+
+FLOW_CHART_STEP = CompiledTemplate("""
+                    <div style="padding: 0px 0px 0px 50px;">
+                        <div style="max-width: 90%; padding: 10px 10px 10px 30px; background-color: #f0f0f0; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; position: relative; page-break-inside: avoid;">
+                            <h4 style="margin: 5px 0; color: #333;">${title}</h4>
+                            <div style="margin-top: 5px; font-size: 0.9em; color: #555; text-align: left;">
+                                ${description}
+                            </div>
+                        </div>
+                    </div>
+                """)
+
+ARROW_CHART_ROW = CompiledTemplate("""
+                    <div style="display: flex; margin-bottom:20px; align-items: center;">
+                        <div style="background-color: #0C6C98; width: 190px; min-height: 80px; border-radius: 10px; display: flex; align-items: center; justify-content: center; color: white; padding-left: 5px; font-weight: bold;">
+                            ${title}
+                        </div>
+                        <div style="width: 230px; min-height: 80px; background-color: #D3D3D3; margin-left: 0px; display: flex; align-items: center; justify-content: flex-start; color: black; font-size: 12px; padding-left: 10px; line-height: 1.5;">
+                            ${content}
+                        </div>
+                        <div style="width: 0; height: 0; border-top: 40px solid transparent; border-bottom: 40px solid transparent; border-left: 70px solid #D3D3D3;"></div>
+                    </div>
+                """)
+
+ARROW_CHART_SECTION = CompiledTemplate("""
+        <div style="page-break-after: always;">
+            ${arrow_chart}
+        </div>
+        """)
+
+HTML2PDF_VERSION = "0.9.2"
+HTML2PDF_CDN_URL = f"https://cdnjs.cloudflare.com/ajax/libs/html2pdf.js/{HTML2PDF_VERSION}/html2pdf.bundle.min.js"
+
+# SHA-256 of the pinned bundle at HTML2PDF_CDN_URL. The fetch script refuses any other download, and
+# the inline and static modes refuse a vendored file that does not match. Empty until a verified copy
+# is committed under static/; FLOWCHART_HTML2PDF_SHA256 pins a copy vendored at deploy time.
+HTML2PDF_SHA256 = os.getenv("FLOWCHART_HTML2PDF_SHA256", "")
+
+# Vendored copy of html2pdf.bundle.min.js (see scripts/fetch_html2pdf.py)
+HTML2PDF_PATH = os.getenv("FLOWCHART_HTML2PDF_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "html2pdf.bundle.min.js"))
+
+# "inline" embeds the vendored script in the document, "static" loads it once from Streamlit's
+# static file server (browser-cached across previews), "cdn" keeps the original cdnjs URL.
+# Inline is the default once a digest is pinned; until then the button keeps working from the CDN
+HTML2PDF_MODE = os.getenv("FLOWCHART_HTML2PDF_MODE", "inline" if HTML2PDF_SHA256 else "cdn")
+HTML2PDF_STATIC_URL = os.getenv("FLOWCHART_HTML2PDF_URL", "/app/static/html2pdf.bundle.min.js")
+
+DOWNLOAD_SCRIPT = """<script>
+                function downloadPDF() {
+                    const element = document.getElementById('pdf-content');
+                    html2pdf()
+                        .from(element)
+                        .set({
+                            margin: 1,
+                            filename: 'business_flow_chart.pdf',
+                            html2canvas: { scale: 2 },
+                            jsPDF: { format: 'a4', orientation: 'portrait' }
+                        }).save();
+                }
+            </script>"""
+
+
+def verify_html2pdf(data: bytes, sha256: str = HTML2PDF_SHA256) -> None:
+    """Raise ValueError unless ``data`` is the html2pdf.js bundle with the pinned ``sha256``."""
+    if not sha256:
+        raise ValueError("No pinned sha256 for html2pdf.js; set HTML2PDF_SHA256 (or FLOWCHART_HTML2PDF_SHA256) to the published digest")
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != sha256.lower():
+        raise ValueError(f"html2pdf.js sha256 mismatch: expected {sha256}, got {digest}")
+
+
+def _read_vendored_html2pdf() -> Optional[bytes]:
+    """The verified vendored bundle, or None (logged) when it is missing or does not match the pin."""
+    try:
+        with open(HTML2PDF_PATH, "rb") as f:
+            data = f.read()
+        verify_html2pdf(data)
+    except (OSError, ValueError) as e:
+        logger.error("In-browser PDF download disabled: vendored html2pdf script unusable (%s); "
+                     "run scripts/fetch_html2pdf.py or set FLOWCHART_HTML2PDF_MODE=cdn", e)
+        return None
+    return data
+
+
+@lru_cache(maxsize=None)
+def get_pdf_script(mode: str = HTML2PDF_MODE) -> str:
+    """Return the html2pdf.js library plus the downloadPDF() helper for the in-browser download button.
+
+    The vendored file is read and verified once per process. In the inline and
+    static modes a missing or unverified file gives an empty string, and the
+    document leaves out the in-browser download button rather than reaching for
+    the network; only the "cdn" mode loads the script from cdnjs.
+    """
+    if mode in ("inline", "static"):
+        data = _read_vendored_html2pdf()
+        if data is None:
+            return ""
+        if mode == "inline":
+            # A literal closing tag inside the bundle would end the inline script early
+            library = data.decode("utf-8").replace("</script", "<\\/script")
+            return f"<script>{library}</script>\n            {DOWNLOAD_SCRIPT}"
+
+    src = HTML2PDF_STATIC_URL if mode == "static" else HTML2PDF_CDN_URL
+    return f'<script src="{src}"></script>\n            {DOWNLOAD_SCRIPT}'
+
+
+DOWNLOAD_BUTTON = '<button onclick="downloadPDF()">Download PDF</button>'
+
+# Branching flow charts are drawn one layer per row: the nodes of a layer side by side, with a
+# dashed line standing in for each edge that passes through the layer on its way further down
+GRAPH_LAYER = CompiledTemplate("""<div style="display: flex; justify-content: center; align-items: stretch; gap: 20px; width: 100%;">${nodes}</div>""")
+
+GRAPH_STEP = CompiledTemplate("""
+                    <div style="flex: 1; max-width: 320px; padding: 10px 15px; background-color: #f0f0f0; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; page-break-inside: avoid;">
+                        <h4 style="margin: 5px 0; color: #333;">${title}</h4>
+                        <div style="margin-top: 5px; font-size: 0.9em; color: #555; text-align: left;">
+                            ${description}
+                        </div>${branches}
+                    </div>
+                """)
+
+DECISION_STEP = CompiledTemplate("""
+                    <div style="flex: 1; max-width: 320px; padding: 10px 15px; background-color: #fff; border: 2px solid #0C6C98; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; page-break-inside: avoid;">
+                        <h4 style="margin: 5px 0; color: #0C6C98;">&#9670; ${title}</h4>
+                        <div style="margin-top: 5px; font-size: 0.9em; color: #555; text-align: left;">
+                            ${description}
+                        </div>${branches}
+                    </div>
+                """)
+
+# Where an edge out of a node goes, listed under the node when the layout alone does not make it obvious
+GRAPH_BRANCH = CompiledTemplate("""<div style="margin-top: 5px; font-size: 0.85em; color: #0C6C98; text-align: left;">${arrow} ${label}${target}</div>""")
+
+GRAPH_EDGE = '<div style="width: 0; border-left: 2px dashed #999;"></div>'
+
+# One process's flow chart; the first section keeps the original "flow-chart" id
+FLOW_CHART_SECTION = CompiledTemplate("""<div id="${section_id}">
+                    <h3>${title}:</h3>
+                    <div style="display: flex; flex-direction: column; align-items: center; gap: 20px;">
+                        ${flow_chart}
+                    </div>
+                </div>
+                """)
+
+DOCUMENT = CompiledTemplate("""
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Business Flow Chart</title>
+            ${pdf_script}
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; max-width: 210mm; margin: 0 auto;">
+            <div id="pdf-content" style="padding: 50px;">
+                <h3 style="margin-top: 20px; text-align: center;">${name}</h3>
+                <h5>Date: ${date}</h5>
+                <h4>Subject: Business Flow Chart</h4>
+
+                <!-- Introduction Section with Company Description -->
+                <div style="font-size: 0.9em;">
+                    <p>${description}</p>
+                </div>
+
+                <!-- Arrow Chart with Page Break -->
+                ${arrow_chart}
+
+                <!-- Flow Chart -->
+                ${flow_charts}
+
+                <p style="margin-top: 100px">I hereby declare that the information is complete and best to my knowledge.</p>
+                <p>Authorized Signatory (Sign & Stamp)</p>
+            </div>
+
+            <!-- Download button -->
+            ${download_button}
+        </body>
+        </html>
+        """)
+
+
+class TemplateSet:
+    """The group of templates that together produce one style of document."""
+
+    __slots__ = ("step_connector", "flow_chart_step", "arrow_chart_row", "arrow_chart_section", "flow_chart_section", "document",
+                 "graph_layer", "graph_step", "decision_step", "graph_branch", "graph_edge")
+
+    def __init__(self, step_connector, flow_chart_step, arrow_chart_row, arrow_chart_section, flow_chart_section, document,
+                 graph_layer, graph_step, decision_step, graph_branch, graph_edge):
+        self.step_connector = step_connector
+        self.flow_chart_step = flow_chart_step
+        self.arrow_chart_row = arrow_chart_row
+        self.arrow_chart_section = arrow_chart_section
+        self.flow_chart_section = flow_chart_section
+        self.document = document
+        self.graph_layer = graph_layer
+        self.graph_step = graph_step
+        self.decision_step = decision_step
+        self.graph_branch = graph_branch
+        self.graph_edge = graph_edge
+
+
+# Every element carries its own inline style, as in the original output
+INLINE = TemplateSet(STEP_CONNECTOR, FLOW_CHART_STEP, ARROW_CHART_ROW, ARROW_CHART_SECTION, FLOW_CHART_SECTION, DOCUMENT,
+                     GRAPH_LAYER, GRAPH_STEP, DECISION_STEP, GRAPH_BRANCH, GRAPH_EDGE)
+
+# The same rules as the inline templates, declared once and referenced by class
+STYLESHEET = """
+        body { font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; max-width: 210mm; margin: 0 auto; }
+        #pdf-content { padding: 50px; }
+        .company { margin-top: 20px; text-align: center; }
+        .intro { font-size: 0.9em; }
+        .arrow-chart { page-break-after: always; }
+        .ac-row { display: flex; margin-bottom: 20px; align-items: center; }
+        .ac-title { background-color: #0C6C98; width: 190px; min-height: 80px; border-radius: 10px; display: flex; align-items: center; justify-content: center; color: white; padding-left: 5px; font-weight: bold; }
+        .ac-content { width: 230px; min-height: 80px; background-color: #D3D3D3; margin-left: 0px; display: flex; align-items: center; justify-content: flex-start; color: black; font-size: 12px; padding-left: 10px; line-height: 1.5; }
+        .ac-arrow { width: 0; height: 0; border-top: 40px solid transparent; border-bottom: 40px solid transparent; border-left: 70px solid #D3D3D3; }
+        .steps { display: flex; flex-direction: column; align-items: center; gap: 20px; }
+        .step { padding: 0px 0px 0px 50px; }
+        .step-box { max-width: 90%; padding: 10px 10px 10px 30px; background-color: #f0f0f0; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; position: relative; page-break-inside: avoid; }
+        .step-title { margin: 5px 0; color: #333; }
+        .step-desc { margin-top: 5px; font-size: 0.9em; color: #555; text-align: left; }
+        .connector { position: relative; text-align: center; font-size: 24px; }
+        .connector-arrow { width: 0; height: 0; border-left: 10px solid transparent; border-right: 10px solid transparent; border-top: 10px solid #333; margin: 10px auto; }
+        .graph-layer { display: flex; justify-content: center; align-items: stretch; gap: 20px; width: 100%; }
+        .graph-step { flex: 1; max-width: 320px; padding: 10px 15px; background-color: #f0f0f0; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; page-break-inside: avoid; }
+        .graph-step.decision { background-color: #fff; border: 2px solid #0C6C98; }
+        .graph-step.decision .step-title { color: #0C6C98; }
+        .branch { margin-top: 5px; font-size: 0.85em; color: #0C6C98; text-align: left; }
+        .graph-edge { width: 0; border-left: 2px dashed #999; }
+        .declaration { margin-top: 100px; }
+"""
+
+COMPACT = TemplateSet(
+    '<div class="connector"><div class="connector-arrow"></div></div>',
+    CompiledTemplate("""
+                    <div class="step">
+                        <div class="step-box">
+                            <h4 class="step-title">${title}</h4>
+                            <div class="step-desc">
+                                ${description}
+                            </div>
+                        </div>
+                    </div>
+                """),
+    CompiledTemplate("""
+                    <div class="ac-row">
+                        <div class="ac-title">
+                            ${title}
+                        </div>
+                        <div class="ac-content">
+                            ${content}
+                        </div>
+                        <div class="ac-arrow"></div>
+                    </div>
+                """),
+    CompiledTemplate("""
+        <div class="arrow-chart">
+            ${arrow_chart}
+        </div>
+        """),
+    CompiledTemplate("""<div id="${section_id}">
+                    <h3>${title}:</h3>
+                    <div class="steps">
+                        ${flow_chart}
+                    </div>
+                </div>
+                """),
+    CompiledTemplate("""
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Business Flow Chart</title>
+            <style>""" + STYLESHEET + """</style>
+            ${pdf_script}
+        </head>
+        <body>
+            <div id="pdf-content">
+                <h3 class="company">${name}</h3>
+                <h5>Date: ${date}</h5>
+                <h4>Subject: Business Flow Chart</h4>
+
+                <!-- Introduction Section with Company Description -->
+                <div class="intro">
+                    <p>${description}</p>
+                </div>
+
+                <!-- Arrow Chart with Page Break -->
+                ${arrow_chart}
+
+                <!-- Flow Chart -->
+                ${flow_charts}
+
+                <p class="declaration">I hereby declare that the information is complete and best to my knowledge.</p>
+                <p>Authorized Signatory (Sign & Stamp)</p>
+            </div>
+
+            <!-- Download button -->
+            ${download_button}
+        </body>
+        </html>
+        """),
+    CompiledTemplate("""<div class="graph-layer">${nodes}</div>"""),
+    CompiledTemplate("""
+                    <div class="graph-step">
+                        <h4 class="step-title">${title}</h4>
+                        <div class="step-desc">
+                            ${description}
+                        </div>${branches}
+                    </div>
+                """),
+    CompiledTemplate("""
+                    <div class="graph-step decision">
+                        <h4 class="step-title">&#9670; ${title}</h4>
+                        <div class="step-desc">
+                            ${description}
+                        </div>${branches}
+                    </div>
+                """),
+    CompiledTemplate("""<div class="branch">${arrow} ${label}${target}</div>"""),
+    '<div class="graph-edge"></div>',
+)
+
+_COMMENT = re.compile(r"<!--.*?-->", re.S)
+_BETWEEN_TAGS = re.compile(r">\s+<")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};:,])\s*")
+
+
+def minify_html(source: str) -> str:
+    """Drop comments and the indentation between tags, and tighten CSS inside <style> blocks.
+
+    Only applied to template sources, never to user content or scripts.
+    """
+    source = _COMMENT.sub("", source)
+    source = re.sub(r"<style>(.*?)</style>", lambda m: "<style>" + _CSS_PUNCTUATION.sub(r"\1", m.group(1)).strip() + "</style>", source, flags=re.S)
+    source = _BETWEEN_TAGS.sub("><", source)
+    # Indentation around placeholders is also insignificant
+    source = re.sub(r">\s+(\$\{)", r">\1", source)
+    source = re.sub(r"(\})\s+<", r"\1<", source)
+    return source.strip()
+
+
+def _minified(template):
+    if isinstance(template, CompiledTemplate):
+        return CompiledTemplate(minify_html(template.source))
+    return minify_html(template)
+
+
+@lru_cache(maxsize=None)
+def get_templates(compact: bool = False, minify: bool = False) -> TemplateSet:
+    """Return the template set for an output mode, compiling it on first use."""
+    templates = COMPACT if compact else INLINE
+    if not minify:
+        return templates
+    return TemplateSet(*(_minified(getattr(templates, name)) for name in TemplateSet.__slots__))
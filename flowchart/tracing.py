@@ -0,0 +1,144 @@
+import contextvars
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+# Most recent spans kept per tracer; older ones are dropped so a long session cannot grow without bound
+MAX_SPANS = 2000
+
+# The active (tracer, parent span id) for the current thread or asyncio task
+_current = contextvars.ContextVar("flowchart_trace", default=(None, None))
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation, with free-form attributes such as byte sizes and token counts."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "duration_ms", "attributes", "_started")
+
+    # Lets callers skip computing attributes that would be thrown away
+    recording = True
+
+    def __init__(self, name: str, parent_id: Optional[int] = None, **attributes):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = attributes
+        self._started = time.perf_counter()
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000.0
+
+    def end(self) -> None:
+        self.duration_ms = self.elapsed_ms()
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "span_id": self.span_id, "parent_id": self.parent_id, "start": self.start,
+                "duration_ms": self.duration_ms, **self.attributes}
+
+
+class _NoopSpan:
+    """Stands in for a span when no tracer is active, so instrumented code costs next to nothing."""
+
+    recording = False
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def elapsed_ms(self) -> float:
+        return 0.0
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Collects finished spans for one session or batch run and exports them as JSON lines."""
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def records(self) -> List[dict]:
+        with self._lock:
+            return [dict(span.to_dict(), trace_id=self.trace_id) for span in self.spans]
+
+    def write_jsonl(self, fp) -> None:
+        for record in self.records():
+            fp.write(json.dumps(record, default=str) + "\n")
+
+    def to_jsonl(self) -> str:
+        return "".join(json.dumps(record, default=str) + "\n" for record in self.records())
+
+    def summary(self) -> List[dict]:
+        """Count and total/max duration per span name, slowest total first."""
+        totals = {}
+        for record in self.records():
+            entry = totals.setdefault(record["name"], {"name": record["name"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += record["duration_ms"] or 0.0
+            entry["max_ms"] = max(entry["max_ms"], record["duration_ms"] or 0.0)
+        return sorted(totals.values(), key=lambda entry: entry["total_ms"], reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+@contextmanager
+def tracing(tracer: Optional[Tracer]):
+    """Send spans opened in this block (and in tasks or bound threads started from it) to ``tracer``."""
+    token = _current.set((tracer, None))
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a child of the enclosing span; a no-op unless a tracer is active."""
+    tracer, parent_id = _current.get()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    current = Span(name, parent_id, **attributes)
+    token = _current.set((tracer, current.span_id))
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.end()
+        tracer.record(current)
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # A generator finished in a different context than it started in
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current.get()[0]
+
+
+def bind_context(func: Callable) -> Callable:
+    """Wrap ``func`` so it runs in a copy of the caller's context, keeping spans attached when run on a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
@@ -0,0 +1,58 @@
+import threading
+from typing import Callable, Optional
+
+
+def usage_from_response(response) -> Optional[dict]:
+    """Read prompt/completion token counts from a completion or final stream chunk, if it carries them."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        # Groq reports streaming usage on the last chunk under x_groq
+        usage = getattr(getattr(response, "x_groq", None), "usage", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    else:
+        prompt_tokens, completion_tokens = getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+    if prompt_tokens is None and completion_tokens is None:
+        return None
+    return {"prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0}
+
+
+class UsageMeter:
+    """Thread-safe running totals of requests and tokens per model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, model: str, usage: dict) -> None:
+        with self._lock:
+            totals = self._totals.setdefault(model, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            totals["requests"] += 1
+            totals["prompt_tokens"] += usage["prompt_tokens"]
+            totals["completion_tokens"] += usage["completion_tokens"]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {model: dict(totals) for model, totals in self._totals.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+# Process-wide totals across every session and batch job
+usage_meter = UsageMeter()
+
+
+def record_usage(model: str, response, on_usage: Optional[Callable[[dict], None]] = None) -> Optional[dict]:
+    """Add a response's token usage to the process-wide meter and pass it to ``on_usage``."""
+    usage = usage_from_response(response)
+    if usage is None:
+        return None
+    usage = dict(usage, model=model)
+    usage_meter.record(model, usage)
+    if on_usage is not None:
+        on_usage(usage)
+    return usage
@@ -1,289 +1,354 @@
-import json
-from datetime import date
-from pydantic import BaseModel
+import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
-from groq import Groq
+from datetime import date
 from typing import List
-import os
-
-# Fetching the API key from the environment variable
-groq_api_key = os.getenv("GROQ_API_KEY")
-
-# Check if API key is available
-if not groq_api_key:
-    st.error("Groq API key not found in environment variable!")
-
-# Initializing the Groq object with the API key
-groq = Groq(api_key=groq_api_key)
+from flowchart import generation
+from flowchart.cache import ResponseCache
+from flowchart.models import FlowChartStep
+from flowchart.export import FORMATS as EXPORT_FORMATS
+from flowchart.pdf import UI_PDF_WORKERS, render_pdf
+from flowchart.providers import load_providers
+from flowchart.render import DEFAULT_PROCESS_TITLE, RenderHTML, build_arrow_chart
+from flowchart.steps import StepTable
+from flowchart.store import ReportStore, StoredReport, make_input_hash
+from flowchart.templates import get_pdf_script, get_templates
+from flowchart.tracing import Tracer, tracing
+
+@st.cache_resource
+def get_llm_provider():
+    """Build the configured LLM provider chain once per process; its clients share one connection pool."""
+    return load_providers()
+
+@st.cache_resource
+def missing_api_keys() -> List[str]:
+    """Names of the configured backends without an API key, looked up once per process."""
+    return [backend.name for backend in getattr(get_llm_provider(), "providers", [get_llm_provider()]) if not backend.api_key]
+
+# Check if API keys are available
+for backend_name in missing_api_keys():
+    st.error(f"{backend_name.title()} API key not found in environment variable!")
 
 # Ensure session state is initialized
 if 'flow_chart_steps' not in st.session_state:
     st.session_state['flow_chart_steps'] = []
-
-class FlowChartStep(BaseModel):
-    title: str
-    description: str
-
-# Function to generate professional content based on input
-def generate_professional_content(section_title: str, user_input: str) -> str:
-    """Simulate generating professional content based on user input."""
-    if "billing" in section_title.lower():
-        return f"The company has implemented a robust billing system. {user_input} This ensures a streamlined invoicing process with multiple payment gateways available to customers."
-    elif "place of supply" in section_title.lower():
-        return f"The primary place of supply is {user_input}, which ensures compliance with the relevant regional tax laws and regulations."
-    elif "expenses and cost of sales" in section_title.lower():
-        return f"The company manages expenses like {user_input}, ensuring that the cost of sales is minimized while maximizing profitability."
-    else:
-        return f"{user_input}"  # Default fallback if no match
-
-def generate_flow_chart_steps(explanation: str) -> List[FlowChartStep]:
-    try:
-        # API call to Groq
-        chat_completion = groq.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": ("Please provide a very detailed step-by-step guide with 6 to 10 steps. Each step should have a title and a description, "
-                                "description shall include key points and it shall have 4-5 points for each title, "
-                                "without new lines. Ensure the JSON is correctly formatted with commas separating the fields, "
-                                "and avoid any extra fields or incorrect structure. "
-                                f"The JSON object must use the schema: {json.dumps(FlowChartStep.model_json_schema(), indent=2)}")
-                },
-                {
-                    "role": "user",
-                    "content": explanation,
-                },
-            ],
-            model="llama3-8b-8192",
-            temperature=0,
-            stream=False,
-            response_format={"type": "json_object"},
-        )
-
-        # Debugging: Print the full response to check the structure
-        st.write("API response:", chat_completion)
-
-        # Ensure response parsing is handled correctly
-        try:
-            response_content = json.loads(chat_completion.choices[0].message.content)
-            st.write("Parsed Content:", response_content)  # For debugging
-            
-            # Check if title and description are available and use them to construct a step
-            if "title" in response_content and "description" in response_content:
-                steps = [{"title": response_content["title"], "description": response_content["description"]}]
-            else:
-                st.error("Title or description not found in response.")
-                return []
-            
-        except json.JSONDecodeError as e:
-            st.error(f"JSON parsing error: {str(e)}")
-            return []
-        
-        return steps
-    
-    except Exception as e:
-        st.error(f"Error generating flow chart steps: {str(e)}")
-        return []
-
-class RenderHTML:
-    def __init__(self, name, description, flow_chart_steps, arrow_chart, business_activity):
-        self.name = name
-        self.description = description  # New field for company description
-        self.flow_chart_steps = flow_chart_steps if flow_chart_steps else []  # Ensure flow_chart_steps is a list
-        self.arrow_chart = arrow_chart
-        self.business_activity = business_activity  # The input business activity is directly passed
-
-    def improve_arrow_chart_content(self):
-        """Modify and improve the arrow chart content based on user inputs."""
-        return {
-            "title1": self.arrow_chart.get('title1', 'Business Activity').title().strip(),
-            "content1": generate_professional_content('Business Activity', self.business_activity),  # Use dynamic generation
-
-            "title2": self.arrow_chart.get('title2', 'Billing System').title().strip(),
-            "content2": generate_professional_content('Billing System', self.arrow_chart.get('content2')),  # Dynamic billing system content
-            
-            "title3": self.arrow_chart.get('title3', 'Place Of Supply').title().strip(),
-            "content3": generate_professional_content('Place of Supply', self.arrow_chart.get('content3')),  # Dynamic place of supply content
-            
-            "title4": self.arrow_chart.get('title4', 'Expenses And Cost Of Sales').title().strip(),
-            "content4": generate_professional_content('Expenses and Cost of Sales', self.arrow_chart.get('content4')),  # Dynamic expense content
-        }
-
-    def generate_arrow_chart(self):
-        """Generate the improved arrow chart HTML."""
-        improved_arrow_chart = self.improve_arrow_chart_content()
-
-        category_chart_html = ""
-        for i in range(1, 5):
-            title = improved_arrow_chart.get(f'title{i}', '').strip()
-            content = improved_arrow_chart.get(f'content{i}', '').strip()
-            
-            if title or content:  # Only render if there's valid content
-                category_chart_html += f"""
-                    <div style="display: flex; margin-bottom:20px; align-items: center;">
-                        <div style="background-color: #0C6C98; width: 190px; min-height: 80px; border-radius: 10px; display: flex; align-items: center; justify-content: center; color: white; padding-left: 5px; font-weight: bold;">
-                            {title}
-                        </div>
-                        <div style="width: 230px; min-height: 80px; background-color: #D3D3D3; margin-left: 0px; display: flex; align-items: center; justify-content: flex-start; color: black; font-size: 12px; padding-left: 10px; line-height: 1.5;">
-                            {content.replace(',', '<br>')}
-                        </div>
-                        <div style="width: 0; height: 0; border-top: 40px solid transparent; border-bottom: 40px solid transparent; border-left: 70px solid #D3D3D3;"></div>
-                    </div>
-                """
-        return category_chart_html
-
-    def generate_flow_chart(self):
-        """Generate the flow chart HTML content."""
-        if not self.flow_chart_steps:
-            return "<p>No flow chart steps available.</p>"
-
-        flow_chart_html = ""
-        try:
-            for index, step in enumerate(self.flow_chart_steps):
-                if index != 0:
-                    flow_chart_html += """<div style="position: relative; text-align: center; font-size: 24px;">
-                                            <div style="width: 0; height: 0; border-left: 10px solid transparent; border-right: 10px solid transparent; border-top: 10px solid #333; margin: 10px auto;"></div>
-                                        </div>"""
-                
-                flow_chart_html += f"""
-                    <div style="padding: 0px 0px 0px 50px;">
-                        <div style="max-width: 90%; padding: 10px 10px 10px 30px; background-color: #f0f0f0; border-radius: 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1); text-align: center; position: relative; page-break-inside: avoid;">
-                            <h4 style="margin: 5px 0; color: #333;">{step['title']}</h4>
-                            <div style="margin-top: 5px; font-size: 0.9em; color: #555; text-align: left;">
-                                {step['description'].replace('*', '') if isinstance(step['description'], str) else str(step['description']).replace('*', '').replace('[', '').replace(']', '')}
-                            </div>
-                        </div>
-                    </div>
-                """
-        except Exception as e:
-            st.error(f"Error generating flow chart: {str(e)}")
-            return "<p>Error generating flow chart content.</p>"
-
-        return flow_chart_html
-
-    def generate_html(self):
-        """Generate the complete HTML output including flow chart and arrow chart."""
-        flow_chart_html = self.generate_flow_chart()
-        arrow_chart_html = self.generate_arrow_chart()
-
-        arrow_chart_with_page_break = f"""
-        <div style="page-break-after: always;">
-            {arrow_chart_html}
-        </div>
-        """ if arrow_chart_html else ""
-
-        html_content = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Business Flow Chart</title>
-            <script src="https://cdnjs.cloudflare.com/ajax/libs/html2pdf.js/0.9.2/html2pdf.bundle.min.js"></script>
-            <script>
-                function downloadPDF() {{
-                    const element = document.getElementById('pdf-content');
-                    html2pdf()
-                        .from(element)
-                        .set({{
-                            margin: 1,
-                            filename: 'business_flow_chart.pdf',
-                            html2canvas: {{ scale: 2 }},
-                            jsPDF: {{ format: 'a4', orientation: 'portrait' }}
-                        }}).save();
-                }}
-            </script>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; max-width: 210mm; margin: 0 auto;">
-            <div id="pdf-content" style="padding: 50px;">
-                <h3 style="margin-top: 20px; text-align: center;">{self.name}</h3>
-                <h5>Date: {date.today().strftime("%d/%m/%Y")}</h5>
-                <h4>Subject: Business Flow Chart</h4>
-                
-                <!-- Introduction Section with Company Description -->
-                <div style="font-size: 0.9em;">
-                    <p>{self.description}</p>
-                </div>
-
-                <!-- Arrow Chart with Page Break -->
-                {arrow_chart_with_page_break}
-
-                <!-- Flow Chart -->
-                <div id="flow-chart">
-                    <h3>Procurement Process:</h3>
-                    <div style="display: flex; flex-direction: column; align-items: center; gap: 20px;">
-                        {flow_chart_html}
-                    </div>
-                </div>
-
-                <p style="margin-top: 100px">I hereby declare that the information is complete and best to my knowledge.</p>
-                <p>Authorized Signatory (Sign & Stamp)</p>
-            </div>
-
-            <!-- Download button -->
-            <button onclick="downloadPDF()">Download PDF</button>
-        </body>
-        </html>
-        """
-        return html_content
+if 'step_tables' not in st.session_state:
+    st.session_state['step_tables'] = [(DEFAULT_PROCESS_TITLE, StepTable())]  # (process title, steps) per section
+if 'explanation_input' not in st.session_state:
+    st.session_state['explanation_input'] = "Step Explanation"  # Set here rather than as the widget default, since a saved report can overwrite it
+if 'tracer' not in st.session_state:
+    st.session_state['tracer'] = Tracer()
+
+# Timings are only collected while the debug panel is shown
+st.sidebar.checkbox("Show debug panel", value=False, key="show_debug")
+
+def active_tracer():
+    return st.session_state['tracer'] if st.session_state.get("show_debug") else None
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Open the on-disk response cache once per process and share it across sessions."""
+    return ResponseCache()
+
+@st.cache_resource
+def get_report_store() -> ReportStore:
+    """Open the report store once per process; saved reports survive browser refreshes and restarts."""
+    return ReportStore()
+
+@st.cache_resource
+def warm_templates() -> None:
+    """Compile the HTML template sets and load the html2pdf script once per process, not on a user's first render."""
+    for compact in (False, True):
+        for minify in (False, True):
+            get_templates(compact, minify)
+    get_pdf_script()
+
+warm_templates()
+
+def generate_flow_chart_steps(explanation: str, use_cache: bool = True, on_usage=None) -> List[FlowChartStep]:
+    return generation.generate_flow_chart_steps(explanation, get_llm_provider(), get_response_cache(), use_cache, on_error=st.error,
+                                                on_usage=on_usage)
+
+def stream_flow_chart_steps(explanation: str, use_cache: bool = True, on_usage=None):
+    return generation.stream_flow_chart_steps(explanation, get_llm_provider(), get_response_cache(), use_cache, on_error=st.error,
+                                              on_usage=on_usage)
+
+def find_draft(explanation: str):
+    """(similarity, steps) of the closest earlier explanation, or None if nothing cached is similar enough."""
+    return generation.find_similar_steps(explanation, get_llm_provider(), get_response_cache())
+
+def generate_process_steps(processes: List[dict], use_cache: bool = True, on_usage=None) -> List[dict]:
+    # The calls run on worker threads, where st.error cannot draw, so errors are shown once they all finish
+    errors = []
+    results = generation.generate_process_steps(processes, get_llm_provider(), get_response_cache(), use_cache,
+                                                on_error=errors.append, on_usage=on_usage)
+    for error in errors:
+        st.error(error)
+    return results
 
 # Streamlit UI
 st.title("Business Flow Chart Renderer")
 
-# Input fields
-name_input = st.text_input("Enter the name of the company:", "")
-business_description_input = st.text_area("Enter the Company Description:")  # New input for company description
-business_activity_input = st.text_area("Enter the Business Activity:")  # New input for business activity
-input_arrowchart_content2 = st.text_input('Billing system (how payment is collected from customers)', key="input_arrowchart_content2")
-input_arrowchart_content3 = st.text_input('Enter the Place of Supply', key="input_arrowchart_content3")  # Updated Place of Supply
-input_arrowchart_content4 = st.text_input('Enter the content For EXPENSES AND COST OF SALES', key="input_arrowchart_content4")  # Updated for expenses
-
-arrow_chart = {
-    "title1": "BUSINESS",
-    "title2": "Billing System",
-    "title3": "PLACE OF SUPPLY",
-    "title4": "EXPENSES AND COST OF SALES",
-    "content1": business_activity_input,  # Directly using the user input for business activity
-    "content2": input_arrowchart_content2,
-    "content3": input_arrowchart_content3,  # Dynamically pass the Place of Supply content
-    "content4": input_arrowchart_content4   # Dynamically pass the Expenses and Cost of Sales content
-}
+# Each fragment below reruns on its own when one of its widgets changes; the rest of the page is left as it was.
+# Widgets are keyed, so any fragment can read the current values from session state.
+
+@st.fragment
+def company_details():
+    st.text_input("Enter the name of the company:", "", key="name_input")
+    st.text_area("Enter the Company Description:", key="business_description_input")  # New input for company description
+    st.text_area("Enter the Business Activity:", key="business_activity_input")  # New input for business activity
+    st.text_input('Billing system (how payment is collected from customers)', key="input_arrowchart_content2")
+    st.text_input('Enter the Place of Supply', key="input_arrowchart_content3")  # Updated Place of Supply
+    st.text_input('Enter the content For EXPENSES AND COST OF SALES', key="input_arrowchart_content4")  # Updated for expenses
+
+@st.cache_data(max_entries=256)
+def get_arrow_chart(business_activity: str, billing: str, place_of_supply: str, expenses: str) -> dict:
+    return build_arrow_chart(business_activity, billing, place_of_supply, expenses)
+
+def current_arrow_chart() -> dict:
+    return get_arrow_chart(
+        st.session_state.get("business_activity_input", ""),  # Directly using the user input for business activity
+        st.session_state.get("input_arrowchart_content2", ""),
+        st.session_state.get("input_arrowchart_content3", ""),  # Dynamically pass the Place of Supply content
+        st.session_state.get("input_arrowchart_content4", ""),  # Dynamically pass the Expenses and Cost of Sales content
+    )
+
+def html_generator_for(flow_chart_steps, **options) -> RenderHTML:
+    return RenderHTML(
+        name=st.session_state.get("name_input", ""),
+        description=st.session_state.get("business_description_input", ""),  # Pass company description input
+        flow_chart_steps=flow_chart_steps,
+        arrow_chart=current_arrow_chart(),
+        business_activity=st.session_state.get("business_activity_input", ""),  # Pass the business activity input
+        on_error=st.error,
+        **options
+    )
+
+company_details()
 
 st.subheader("Flow Chart Steps")
-explanation = st.text_area("Step Explanation", "Step Explanation")
+explanation = st.text_area("Step Explanation", key="explanation_input")
+extra_processes = st.data_editor(
+    pd.DataFrame(columns=["title", "explanation"], dtype="string"),
+    key="extra_processes",
+    num_rows="dynamic",
+    width="stretch",
+    column_config={
+        "title": st.column_config.TextColumn("Additional process", help="e.g. Sales Process, Payroll Process, Inventory Process"),
+        "explanation": st.column_config.TextColumn("Explanation", width="large"),
+    },
+)
+# Empty grid cells come back as pandas NA rather than strings
+extra_processes = [
+    {"title": process["title"].strip(), "explanation": process["explanation"].strip()}
+    for process in extra_processes.to_dict("records")
+    if isinstance(process["title"], str) and process["title"].strip()
+    and isinstance(process["explanation"], str) and process["explanation"].strip()
+]
+use_cached_steps = st.checkbox("Reuse previously generated steps for the same explanation", value=True)
+stream_steps = st.checkbox("Show steps as they are generated (single process only)", value=True)
+
+def report_inputs() -> dict:
+    """The company inputs of the report being edited, as ReportStore.save takes them."""
+    return {
+        "name": st.session_state.get("name_input", ""),
+        "description": st.session_state.get("business_description_input", ""),
+        "business_activity": st.session_state.get("business_activity_input", ""),
+        "arrow_chart": current_arrow_chart(),
+    }
+
+def show_stored_report(report: StoredReport) -> None:
+    st.session_state['report_id'] = report.report_id
+    st.session_state['report_explanations'] = [process.get("explanation") or "" for process in report.processes]
+    st.session_state['flow_chart_steps'] = report.flow_chart_steps
+    st.session_state['step_tables'] = [(process["title"], StepTable.from_steps(process["steps"])) for process in report.processes]
+    st.session_state.pop('rendered_report', None)
+
+def load_report(report_id: int) -> None:
+    """Fill the form and the step editor from a saved report; runs as a button callback, before the widgets are drawn."""
+    report = get_report_store().get(report_id)
+    if report is None:
+        return
+    st.session_state["name_input"] = report.company
+    st.session_state["business_description_input"] = report.description
+    st.session_state["business_activity_input"] = report.business_activity
+    for index in (2, 3, 4):
+        st.session_state[f"input_arrowchart_content{index}"] = report.arrow_chart.get(f"content{index}") or ""
+    if report.processes:
+        st.session_state["explanation_input"] = report.processes[0].get("explanation") or ""
+    show_stored_report(report)
+
+with st.sidebar.expander("Saved reports"):
+    company_filter = st.text_input("Company", key="saved_report_filter")
+    saved_reports = get_report_store().list(company=company_filter, limit=20)
+    if saved_reports:
+        saved_report_id = st.selectbox("Report", [report["id"] for report in saved_reports],
+                                       format_func={report["id"]: f"{report['company'] or 'Unnamed'} ({report['day']}, {report['steps']} steps)"
+                                                    for report in saved_reports}.get)
+        st.button("Load", on_click=load_report, args=(saved_report_id,))
+    else:
+        st.caption("No saved reports yet.")
 
-# Button to generate flow chart steps
+# Button to generate flow chart steps; new steps replace the editor's table, so this reruns the whole page
 if st.button("Generate Flow Chart"):
-    flow_chart_steps = generate_flow_chart_steps(explanation)
-    st.session_state['flow_chart_steps'] = flow_chart_steps  # Store in session state
+    processes = [{"title": DEFAULT_PROCESS_TITLE, "explanation": explanation}] + extra_processes
+    inputs = report_inputs()
+    st.session_state.pop('rendered_report', None)  # The preview showed the previous steps
+    # The same inputs as a saved report reuse its steps, however long ago it was generated
+    stored = get_report_store().find(make_input_hash(processes=processes, **inputs)) if use_cached_steps else None
+    if stored is not None and all(process["steps"] for process in stored.processes):
+        show_stored_report(stored)
+        st.caption(f"Reused the steps saved on {date.fromtimestamp(stored.created):%d/%m/%Y}")
+    else:
+        with tracing(active_tracer()):
+            usage = []  # Token counts of each LLM request; empty when the answer came from the cache
+            # While the LLM works, show what a similar earlier explanation produced
+            draft = find_draft(explanation) if use_cached_steps and not extra_processes else None
+            draft_preview = st.empty()
+            if draft is not None:
+                with draft_preview.container():
+                    st.caption(f"Draft from an earlier explanation that is {draft[0]:.0%} similar")
+                    st.markdown(html_generator_for(draft[1]).generate_flow_chart(), unsafe_allow_html=True)
+            if extra_processes:
+                # One LLM call per process, all in flight at once
+                results = generate_process_steps(processes, use_cache=use_cached_steps, on_usage=usage.append)
+                st.session_state['flow_chart_steps'] = results[0]["steps"]
+                st.session_state['step_tables'] = [(result["title"], StepTable.from_steps(result["steps"])) for result in results]
+            elif stream_steps:
+                # Append each step to session state and redraw the preview as soon as it arrives
+                st.session_state['flow_chart_steps'] = []
+                preview = st.empty()
+                for step in stream_flow_chart_steps(explanation, use_cache=use_cached_steps, on_usage=usage.append):
+                    draft_preview.empty()
+                    st.session_state['flow_chart_steps'].append(step)
+                    preview_generator = html_generator_for(st.session_state['flow_chart_steps'])
+                    preview.markdown(preview_generator.generate_flow_chart(), unsafe_allow_html=True)
+                preview.empty()
+            else:
+                flow_chart_steps = generate_flow_chart_steps(explanation, use_cache=use_cached_steps, on_usage=usage.append)
+                st.session_state['flow_chart_steps'] = flow_chart_steps  # Store in session state
+            draft_preview.empty()
+            if draft is not None and not st.session_state['flow_chart_steps']:
+                st.session_state['flow_chart_steps'] = draft[1]
+                st.info(f"No new steps were generated, so the draft from the {draft[0]:.0%} similar explanation is loaded for editing.")
+            if not extra_processes:
+                # A new table version gives the step editor a new key, so earlier edits are not replayed onto new steps
+                st.session_state['step_tables'] = [(DEFAULT_PROCESS_TITLE, StepTable.from_steps(st.session_state['flow_chart_steps']))]
+            if usage:
+                st.caption(f"Tokens: {sum(u['prompt_tokens'] for u in usage):,} prompt + "
+                           f"{sum(u['completion_tokens'] for u in usage):,} completion")
+        # Save the new steps right away, so a browser refresh can load them again without another LLM call
+        generated = [dict(process, steps=step_table.to_steps()) for process, (_, step_table) in zip(processes, st.session_state['step_tables'])]
+        st.session_state['report_explanations'] = [process["explanation"] for process in processes]
+        st.session_state['report_id'] = None
+        if all(process["steps"] for process in generated):
+            st.session_state['report_id'] = get_report_store().save(processes=generated, **inputs)
+
+def edit_steps(step_table: StepTable) -> List[dict]:
+    # One grid for all steps; the grid keeps the edits as a diff against the generated table
+    editor_key = f"step_editor_{step_table.version}"
+    st.data_editor(
+        step_table.rows(),
+        key=editor_key,
+        num_rows="dynamic",
+        hide_index=True,
+        width="stretch",
+        column_order=("step", "title", "description"),
+        column_config={
+            "step": st.column_config.NumberColumn("Step", help="Change the number to move a step, e.g. 2.5 to place it between steps 2 and 3"),
+            "title": st.column_config.TextColumn("Title"),
+            "description": st.column_config.TextColumn("Description", width="large"),
+        },
+    )
+    return step_table.apply_changes(st.session_state.get(editor_key)).to_steps()
+
+@st.fragment
+def step_editor():
+    st.subheader("Edit Flow Chart Steps")
+    step_tables = st.session_state['step_tables']
+    if len(step_tables) == 1:
+        processes = [{"title": step_tables[0][0], "steps": edit_steps(step_tables[0][1])}]
+    else:
+        processes = []
+        for tab, (title, step_table) in zip(st.tabs([title for title, _ in step_tables]), step_tables):
+            with tab:
+                processes.append({"title": title, "steps": edit_steps(step_table)})
+    st.session_state['flow_chart_steps'] = processes[0]["steps"]
+    st.session_state['processes'] = processes if len(processes) > 1 else None
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def convert_to_pdf(html_for_pdf: str) -> bytes:
+    """Convert a rendered document on the server, once per distinct document, so the PDF does not depend on the browser."""
+    return render_pdf(html_for_pdf, max_workers=UI_PDF_WORKERS)
+
+@st.fragment
+def flow_chart_preview():
+    compact_html = st.checkbox("Compact HTML (shared stylesheet instead of inline styles)", value=False)
+    minify_html = st.checkbox("Minify HTML", value=False)
+
+    # Render the flow chart HTML; it is kept in the session so later buttons can use it
+    if st.button("Render Flow Chart"):
+        with tracing(active_tracer()):
+            html_generator = html_generator_for(st.session_state['flow_chart_steps'], compact=compact_html, minify=minify_html,
+                                                processes=st.session_state.get('processes'))
+            rendered = {"html": html_generator.generate_html(), "html_for_pdf": html_generator.generate_html(for_pdf=True),
+                        "size": html_generator.size_report() if compact_html or minify_html else None,
+                        "exports": {fmt: html_generator.generate_export(fmt) for fmt in ("mermaid", "dot", "svg")}}
+            st.session_state['rendered_report'] = rendered
+
+            # The saved report follows the steps as edited, and keeps what was rendered from them
+            if st.session_state.get('report_id') is not None:
+                edited = st.session_state.get('processes') or [{"title": DEFAULT_PROCESS_TITLE, "steps": st.session_state['flow_chart_steps']}]
+                processes = [dict(process, explanation=explanation)
+                             for process, explanation in zip(edited, st.session_state.get('report_explanations', []))]
+                get_report_store().save(processes=processes, artifacts={"html": rendered["html_for_pdf"]},
+                                        report_id=st.session_state['report_id'], **report_inputs())
+
+    rendered = st.session_state.get('rendered_report')
+    if rendered is None:
+        return
+    components.html(rendered["html"], height=800, scrolling=True)
+    if rendered["size"]:
+        size = rendered["size"]
+        st.caption(f"HTML size: {size['output_bytes']:,} bytes vs {size['inline_bytes']:,} bytes inline "
+                   f"({size['saved_percent']:.1f}% smaller)")
+
+    # PDF conversion is slow, so it only runs when asked for
+    if "pdf" not in rendered and st.button("Prepare PDF"):
+        with tracing(active_tracer()), st.spinner("Converting to PDF..."):
+            try:
+                rendered["pdf"] = convert_to_pdf(rendered["html_for_pdf"])
+            except Exception as e:
+                st.error(f"Error generating PDF: {str(e)}")
+            else:
+                if st.session_state.get('report_id') is not None:
+                    get_report_store().save_artifacts(st.session_state['report_id'], {"pdf": rendered["pdf"]})
+    if "pdf" in rendered:
+        st.download_button("Download PDF", data=rendered["pdf"], file_name="business_flow_chart.pdf", mime="application/pdf")
+
+    # Lightweight formats for wikis and docs tools
+    for fmt, label in (("mermaid", "Mermaid"), ("dot", "Graphviz DOT"), ("svg", "SVG")):
+        extension, mime = EXPORT_FORMATS[fmt]
+        st.download_button(f"Download {label}", data=rendered["exports"][fmt], file_name=f"business_flow_chart.{extension}", mime=mime)
+
+@st.fragment
+def debug_panel():
+    with st.expander("Debug trace"):
+        trace = st.session_state['tracer']
+        st.button("Refresh")  # Spans recorded by other fragments show up on the next rerun of this one
+        if trace.spans:
+            st.dataframe(trace.summary(), width="stretch")
+            st.dataframe(trace.records(), width="stretch")
+            st.download_button("Download trace (JSON lines)", data=trace.to_jsonl(), file_name="flowchart_trace.jsonl",
+                               mime="application/x-ndjson")
+            st.button("Clear trace", on_click=trace.clear)
+        else:
+            st.caption("No spans recorded yet. Generate or render a flow chart to record timings.")
 
 # Check if flow chart steps are in session state
 if 'flow_chart_steps' in st.session_state:
-    st.subheader("Edit Flow Chart Steps")
-    edited_steps = []
-    
-    for i, step in enumerate(st.session_state['flow_chart_steps']):
-        title_input = st.text_input(f"Step {i+1} Title", value=step['title'], key=f"title_{i}")
-        description_input = st.text_area(f"Step {i+1} Description", value=step['description'], key=f"description_{i}")
-        edited_steps.append({"title": title_input, "description": description_input})
-        
-        if st.button(f"Add Step after Step {i+1}"):
-            edited_steps.insert(i+1, {"title": "", "description": ""})
-
-        if st.button(f"Delete Step {i+1}"):
-            edited_steps.pop(i)
-
-    st.session_state['flow_chart_steps'] = edited_steps  # Update session state with edited steps
-
-    # Render the flow chart HTML
-    if st.button("Render Flow Chart"):
-        html_generator = RenderHTML(
-            name=name_input,
-            description=business_description_input,  # Pass company description input
-            flow_chart_steps=st.session_state['flow_chart_steps'],
-            arrow_chart=arrow_chart,
-            business_activity=business_activity_input  # Pass the business activity input
-        )
-        html_output = html_generator.generate_html()
-        components.html(html_output, height=800, scrolling=True)
+    step_editor()
+    flow_chart_preview()
+
+if st.session_state.get("show_debug"):
+    debug_panel()
@@ -0,0 +1,49 @@
+"""Download the pinned html2pdf.js bundle into static/ so the PDF download works offline.
+
+Run once on a machine with internet access and commit (or copy) the result to
+air-gapped hosts. The download must match HTML2PDF_SHA256 in flowchart/templates.py;
+anything else is rejected and nothing is written:
+
+    python scripts/fetch_html2pdf.py
+
+While no digest is pinned there, pass the published one with --sha256, then pin the
+same value in HTML2PDF_SHA256 (or FLOWCHART_HTML2PDF_SHA256) so the app accepts the file.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flowchart.templates import HTML2PDF_CDN_URL, HTML2PDF_PATH, HTML2PDF_SHA256, verify_html2pdf  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=HTML2PDF_CDN_URL, help="Where to download the bundle from")
+    parser.add_argument("--output", default=HTML2PDF_PATH, help="Where to store the vendored bundle")
+    parser.add_argument("--sha256", default=HTML2PDF_SHA256,
+                        help="Expected digest of the download; defaults to the one pinned in flowchart/templates.py")
+    args = parser.parse_args(argv)
+    if not args.sha256:
+        sys.exit("No sha256 is pinned in flowchart/templates.py; pass the published digest with --sha256")
+
+    with urllib.request.urlopen(args.url, timeout=60) as response:
+        data = response.read()
+    try:
+        verify_html2pdf(data, args.sha256)
+    except ValueError as e:
+        sys.exit(f"Refusing to save {args.url}: {e}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"Saved {len(data):,} bytes to {args.output} (sha256 {hashlib.sha256(data).hexdigest()}, verified)")
+    if args.sha256.lower() != HTML2PDF_SHA256.lower():
+        print("Pin this digest as HTML2PDF_SHA256 (or set FLOWCHART_HTML2PDF_SHA256) for the app to use the file")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ from datetime import date
 from pydantic import BaseModel
 import streamlit as st
 import streamlit.components.v1 as components
-import openai
+from flowchart.providers import Provider
 from typing import List
 import os
 
@@ -14,8 +14,8 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     st.error("OpenAI API key not found in environment variable!")
 
-# Initialize OpenAI with the API key
-openai.api_key = openai_api_key
+# Initialize the OpenAI provider with the API key; it shares the process-wide connection pool
+openai_provider = Provider("openai", "gpt-4", api_key=openai_api_key)
 
 # Ensure session state is initialized
 if 'flow_chart_steps' not in st.session_state:
@@ -40,8 +40,7 @@ def generate_professional_content(section_title: str, user_input: str) -> str:
 def generate_flow_chart_steps(explanation: str) -> List[FlowChartStep]:
     try:
         # API call to OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
+        response = openai_provider.complete(
             messages=[
                 {
                     "role": "system",
@@ -59,7 +58,7 @@ def generate_flow_chart_steps(explanation: str) -> List[FlowChartStep]:
         )
 
         # Extract the content from the response
-        response_content = response['choices'][0]['message']['content']
+        response_content = response.choices[0].message.content
         response_json = json.loads(response_content)  # Parse the JSON response
         steps = []
         for step in response_json:
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from flowchart.parsing import parse_steps
+from flowchart.streaming import StepStreamParser
+
+STEPS = [{"title": "Raise a purchase order", "description": "Approve the request"},
+         {"title": "Pay the invoice", "description": "Match it to the order"}]
+
+
+def stream_steps(text: str, chunk_size: int = 3):
+    parser = StepStreamParser()
+    steps = []
+    for i in range(0, len(text), chunk_size):
+        steps.extend(parser.feed(text[i:i + chunk_size]))
+    return steps + parser.finish()
+
+
+@pytest.mark.parametrize("answer", [
+    {"steps": STEPS},
+    STEPS,
+    {"title": "Procurement", "steps": STEPS},
+    {"title": "Procurement", "description": "How goods are bought", "steps": STEPS},
+    {"process": {"title": "Procurement", "description": "How goods are bought", "steps": STEPS}},
+], ids=["wrapped", "bare list", "wrapper with title", "wrapper with title and description", "nested wrapper"])
+def test_wrapped_steps(answer):
+    text = json.dumps(answer)
+    steps, repaired = parse_steps(text)
+    assert steps == STEPS
+    assert not repaired
+    assert stream_steps(text) == steps
+
+
+def test_single_step():
+    text = json.dumps(STEPS[0])
+    assert parse_steps(text) == ([STEPS[0]], False)
+    assert stream_steps(text) == [STEPS[0]]
+
+
+def test_wrapper_with_title_only_and_no_steps():
+    text = json.dumps({"title": "Procurement", "steps": []})
+    assert parse_steps(text) == ([], False)
+    assert stream_steps(text) == []